@@ -0,0 +1,215 @@
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import Personal_Profile
+import Departments
+import Noise_insertion
+from Schema import plain_columns
+from Random_streams import RandomStreams
+from Storage import storage_formats, excel_max_rows, write_tables
+
+folder_path = sys.path[0]
+output_folder = os.path.join(folder_path, 'benchmarks')   # Folder where the results of every run are saved
+sizes = [1000, 10000, 100000, 1000000]   # Numbers of employees of the benchmarked data sets
+repeats = 1   # Every benchmark is run this many times and the fastest run is reported
+seed = 7
+slowdown_threshold = 1.2   # A benchmark that is this many times slower than in the compared run is a regression
+excel_size_limit = 100000   # Writing excel takes minutes for larger data sets, so only the other formats are timed
+
+
+# The benchmarks of the pipeline. Every benchmark gets the tables of a generated data set and the seed of the random
+# streams and returns the number of rows it processed
+def benchmark_generation(data, seed):
+    employee_df, psychometrics_df = Personal_Profile.generate_employees(len(data['Professional_Profile']), seed)
+    return len(employee_df)
+
+
+def benchmark_recruiters(data, seed):
+    recruiter_index = Personal_Profile.build_recruiter_index(data['Professional_Profile'])
+    return len(Personal_Profile.assign_recruiters(data['Professional_Profile'].copy(), recruiter_index, seed))
+
+
+def benchmark_hires(data, seed):
+    hires_index = Departments.build_hires_index(data['Professional_Profile'])
+    start_of_year = (data['HR']['Year'].values.astype(int) - 1970).astype('datetime64[Y]')
+    Departments.hired_employees(hires_index, data['HR']['ID'].values, start_of_year)
+    return len(data['HR'])
+
+
+def department_benchmark(department):
+    def benchmark_department(data, seed):
+        hires_index = data['Hires Index'] if Departments.needs_hires_index(department) else None
+        return len(Departments.evaluate_department(data['Professional_Profile'], department, hires_index, seed))
+    return benchmark_department
+
+
+# The noise functions change the table they get, so they are given a copy of the profiles, with plain columns where
+# they insert new values. The counters of the records are part of every noise benchmark
+def noise_benchmark(noise):
+    def benchmark_noise(data, seed):
+        spec = Noise_insertion.noise_specs['Professional_Profile']
+        df = plain_columns(data['Professional_Profile'], spec['Characters'] + Noise_insertion.confusion_columns)
+        streams = RandomStreams(seed, 'noise', 'Professional_Profile')
+        counters = Noise_insertion.record_counters(df)
+        if noise == 'typographic_error':
+            Noise_insertion.typographic_error(df, spec['Characters'], spec['Digits'],
+                                              Noise_insertion.typographic_percentage, streams, counters)
+        elif noise == 'nan_insertion':
+            Noise_insertion.nan_insertion(df, Noise_insertion.nan_percentage, streams, counters)
+        elif noise == 'drop_random_records':
+            Noise_insertion.drop_random_records(df, Noise_insertion.drop_percentage, streams, counters)
+        elif noise == 'name_confusion':
+            Noise_insertion.name_confusion(df, Noise_insertion.confusion_percentage, streams, counters)
+        else:
+            Noise_insertion.marital_department_confusion(df, Noise_insertion.confusion_percentage, streams, counters)
+        return len(df)
+    return benchmark_noise
+
+
+def benchmark_noisy_data_set(data, seed):
+    tables = {table: df for table, df in data.items() if table in Noise_insertion.noise_specs}
+    Noise_insertion.noisy_data_set(tables, seed)
+    return sum(len(df) for df in tables.values())
+
+
+# Every storage format writes the whole clean data set into a temporary folder
+def write_benchmark(storage_format):
+    def benchmark_write(data, seed):
+        tables = {table: df for table, df in data.items() if table in Noise_insertion.noise_specs}
+        with tempfile.TemporaryDirectory() as folder:
+            write_tables(tables, os.path.join(folder, 'employees'), storage_format, mode='w')
+        return sum(len(df) for df in tables.values())
+    return benchmark_write
+
+
+benchmarks = {'generation': benchmark_generation, 'recruiters': benchmark_recruiters, 'hires': benchmark_hires}
+for department in Departments.department_metrics.keys():
+    benchmarks['department:' + department] = department_benchmark(department)
+for noise in ['typographic_error', 'nan_insertion', 'drop_random_records', 'name_confusion',
+              'marital_department_confusion']:
+    benchmarks['noise:' + noise] = noise_benchmark(noise)
+benchmarks['noise:data_set'] = benchmark_noisy_data_set
+for storage_format in storage_formats.keys():
+    benchmarks['write:' + storage_format] = write_benchmark(storage_format)
+
+
+# This function tells why a benchmark cannot run on a data set, or returns None if it can
+def skip_reason(name, data):
+    if name == 'write:excel' and max(len(data[table]) for table in Noise_insertion.noise_specs) >= excel_max_rows:
+        return 'too many rows for an excel sheet'
+    if name == 'write:excel' and len(data['Professional_Profile']) > excel_size_limit:
+        return 'more employees than excel_size_limit'
+    if name in ['write:parquet', 'write:feather'] and importlib.util.find_spec('pyarrow') is None:
+        return 'pyarrow is not installed'
+    return None
+
+
+# This function generates the clean data set that the benchmarks of a size work on
+def benchmark_data(size):
+    employee_df, psychometrics_df = Personal_Profile.generate_population(size, seed=seed)
+    data = {'Professional_Profile': employee_df, 'Psychometric_Indicators': psychometrics_df}
+    data.update(Departments.evaluate_all_departments(employee_df, seed=seed))
+    data['Hires Index'] = Departments.build_hires_index(employee_df)
+    return data
+
+
+# This function runs a benchmark repeats times and reports its fastest run. The peak memory is measured in one more run
+# under tracemalloc, which slows the code down and so is not timed. tracemalloc sees the memory of python and numpy but
+# not the memory that pyarrow allocates
+def run_benchmark(name, data, repeats=repeats):
+    times = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        rows = benchmarks[name](data, seed)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    benchmarks[name](data, seed)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'rows': rows, 'seconds': round(min(times), 6), 'rows_per_second': round(rows/max(min(times), 1e-9), 1),
+            'peak_memory_mb': round(peak_memory/2**20, 3)}
+
+
+# This function compares the results of a run with the results of a previous one and returns the regressions
+def compare_results(results, previous_results):
+    previous = {(result['benchmark'], result['size']): result for result in previous_results}
+    regressions = []
+    for result in results:
+        old = previous.get((result['benchmark'], result['size']))
+        if old is None or 'seconds' not in old or 'seconds' not in result:
+            continue
+        result['previous_seconds'] = old['seconds']
+        result['slowdown'] = round(result['seconds']/max(old['seconds'], 1e-9), 3)
+        if result['slowdown'] > slowdown_threshold:
+            regressions.append(result)
+    return regressions
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description='Benchmark the stages of the pipeline on data sets of different sizes '
+                                                 'and save the wall time, rows per second and peak memory of every '
+                                                 'benchmark as json.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=sizes, help='numbers of employees of the data sets')
+    parser.add_argument('--benchmarks', nargs='+', default=None,
+                        help='benchmarks to run, or prefixes of them such as noise: (default: all of %s)' %
+                             ', '.join(benchmarks.keys()))
+    parser.add_argument('--repeats', type=int, default=repeats, help='runs of every benchmark, the fastest is reported')
+    parser.add_argument('--output', default=None, help='json file of the results (default: a new file in %s)' %
+                                                       output_folder)
+    parser.add_argument('--compare', default=None, help='json file of a previous run to compare the results with')
+    args = parser.parse_args(arguments)
+
+    selected = [name for name in benchmarks.keys()
+                if args.benchmarks is None or any(name.startswith(prefix) for prefix in args.benchmarks)]
+    if not selected:
+        parser.error('no benchmark matches %s' % ', '.join(args.benchmarks))
+    args.benchmarks = selected
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    report = {'started': datetime.datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+              'machine': platform.platform(), 'repeats': args.repeats, 'results': []}
+
+    for size in args.sizes:
+        data = benchmark_data(size)
+        for name in args.benchmarks:
+            result = {'benchmark': name, 'size': size}
+            reason = skip_reason(name, data)
+            if reason is None:
+                result.update(run_benchmark(name, data, args.repeats))
+                print('%-40s %9d %10.3fs %14.0f rows/s %10.1f MB' % (name, size, result['seconds'],
+                                                                     result['rows_per_second'],
+                                                                     result['peak_memory_mb']))
+            else:
+                result['skipped'] = reason
+                print('%-40s %9d skipped: %s' % (name, size, reason))
+            report['results'].append(result)
+
+    if args.compare is not None:
+        with open(args.compare) as previous_file:
+            regressions = compare_results(report['results'], json.load(previous_file)['results'])
+        report['compared_with'] = args.compare
+        for result in regressions:
+            print('Regression: %s at %d employees is %.2f times slower' % (result['benchmark'], result['size'],
+                                                                           result['slowdown']))
+
+    output = args.output
+    if output is None:
+        os.makedirs(output_folder, exist_ok=True)
+        output = os.path.join(output_folder, 'benchmark_%s.json' % datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print('Results saved to %s' % output)
@@ -1,349 +1,298 @@
 import numpy as np
 import pandas as pd
-from faker import Faker
-import random
-import datetime
 import sys
-import xlwt
-#import xlrd
-import openpyxl
+import os
+from concurrent.futures import ProcessPoolExecutor
+from Storage import read_table, write_tables
+from Schema import apply_schema
+from Instrumentation import span
+from Random_streams import RandomStreams, entity_counters
 
 folder_path = sys.path[0]
-input_path = folder_path + '\\employees.xlsx'  # Name of the input file
+input_path = os.path.join(folder_path, 'employees')  # Name of the input data set, where the output is also added
+input_format = 'excel'   # Format of the data set tables: 'excel', 'parquet', 'feather' or 'csv'
 
-# There is a number of different seed functions that should be specified to produce a controlled and consistent output
-fake = Faker()
-Faker.seed(1)
+# All random streams of the script are derived from this seed, which produces a controlled and consistent output
 seed = 7
-random.seed(10)
-np.random.seed(seed=5)
 
-employees_df = pd.read_excel(input_path, sheet_name='Professional_Profile', engine='openpyxl')
-evaluation_performance = {'1': 'Low', '2': 'Medium', '3': 'High'}  # Dictionary that will be used for evaluation
-
-
-# ----------------------- Working with the HR department -------------------------------------------------------------#
-# We only extract the useful information for our department to execute calculations faster
-department_df = employees_df[employees_df['Department'] == 'HR'].reset_index()[['ID', 'Date Hired', 'Time Left',
-                                                                        'Salary', 'Working Experience', 'Recruiter ID']]
-
-all_evaluations = []   # Empty list to append the annual evaluations of the department employees
-for i in range(len(department_df)):
-    evaluation = {}
-    evaluation['ID'] = department_df.at[i, 'ID']
-    time_in_company = 2020 - department_df.at[i, 'Time Left'] - int(department_df.at[i, 'Date Hired'][0:4])
-
-    for year in range(min(5, time_in_company)):
-        calendar_year = 2020 - department_df.at[i, 'Time Left'] - year
-        evaluation['Year'] = calendar_year   # Calendar year of the specific evaluation record
-        evaluation['Loyalty'] = calendar_year - int(department_df.at[i, 'Date Hired'][0:4])  # Employee Loyalty
-        evaluation['Number of Promotions'] = int(evaluation['Loyalty']/4)   # Number of promotions of the employee
-        evaluation['Bonus'] = int(np.random.uniform(0, 30)/100*int(department_df.at[i, 'Salary']))   # Annual Bonus
-        evaluation['Overtime'] = int(np.random.uniform(0, 20) / 100 * 1816)  # Annual working hours are 1816
-        evaluation['Chargeability'] = int(np.random.uniform(0, 100))
-
-        percentile = np.random.uniform(0, 100)   # Randomly estimate the percentile of the employee within the department
-        if percentile < 15:
-            evaluation['Department Percentile'] = 'Bottom 15%'
-            evaluation['Performance'] = 'Low'
-        elif percentile > 85:
-            evaluation['Department Percentile'] = 'Top 15%'
-            evaluation['Performance'] = 'High'
-        else:
-            evaluation['Department Percentile'] = 'Mid 70%'
-            evaluation['Performance'] = evaluation_performance[str(int(np.random.uniform(1, 3)))]
-
-        # HR specific evaluation metrics
-
-        # Calculating all employees hired by the specific employee
-        hired_employees_df = employees_df[
-            (((employees_df['Recruiter ID'] == department_df.at[i, 'ID']) &
-                (pd.to_datetime(employees_df['Date Hired'], format='%Y-%m-%d') <=
-                 datetime.datetime.strptime(str(calendar_year), '%Y'))))].reset_index()[['ID', 'Date Hired', 'Time Left']]
-        hired_employees_df['Time in Company'] = 0
-
-        # Calculating the exact time that each of the recruited employees worked for the company
-        for j in hired_employees_df.index:
-            hired_employees_df.at[j, 'Time in Company'] = 2020 - hired_employees_df.at[j, 'Time Left'] - \
-                                                              int(hired_employees_df.at[j, 'Date Hired'][0:4])
-
-        evaluation['Total Time of hired employees(years)'] = hired_employees_df['Time in Company'].sum()  # Total employee time
-        evaluation['Average Recruitment Time(months)'] = float("{:.2f}".format(np.random.uniform(1, 12)))  # Average recruitment time
-
-        active_recruits = hired_employees_df[hired_employees_df['Time Left'] == 0]['Time Left'].count()  #How many recruits are still working in the company
-        evaluation['Employees Fired'] = int(0.2*(len(hired_employees_df) - active_recruits))  # 20% of the recruits that left are considered fired
-
-        all_evaluations.append(evaluation.copy())
-
-hr_df = pd.DataFrame(all_evaluations)
-
-with pd.ExcelWriter(input_path, engine='openpyxl', mode='a') as writer:
-    hr_df.to_excel(writer,  index=False, sheet_name='HR')
-writer.save()
-writer.close()
+number_workers = 1   # Number of processes that evaluate the departments in parallel. 1 evaluates them one by one
+reference_year = 2020   # The current year of the data set, which is the last year that is evaluated
+evaluated_years = 5   # Every employee is evaluated for his/her last years in the company, up to this many
+# The evaluation model: 'random' draws the performance of every record at random, 'psychometric' scores it from the
+# psychometric indicators of the employee
+evaluation_model = 'random'
 
-# ------------------------------------------- HR FINISHED --------------------------------------------------------------
+evaluation_performance = {'1': 'Low', '2': 'Medium', '3': 'High'}  # Dictionary that will be used for evaluation
 
+# In the psychometric model the performance score of an evaluation record is a logistic function of the psychometric
+# indicators of the employee. The weights of a department are the change of the logit for every 10 points of a trait
+# above 50, and the noise is the spread of a normal value added to the logit of every record, so the performance of an
+# employee varies from year to year. Traits without a weight do not count
+performance_intercept = 0.0
+performance_noise = 1.0
+common_weights = {'Industriousness': 0.3, 'Orderliness': 0.1, 'Volatility': -0.15, 'Withdrawal': -0.1}
+performance_weights = {
+    'HR': dict(common_weights, **{'Compassion': 0.3, 'Politeness': 0.2}),
+    'Sales': dict(common_weights, **{'Enthusiasm': 0.3, 'Assertiveness': 0.3}),
+    'Product': dict(common_weights, **{'Openness': 0.2, 'Intellect': 0.1}),
+    'Finance': dict(common_weights, **{'Orderliness': 0.3, 'Intellect': 0.15}),
+    'Legal': dict(common_weights, **{'Intellect': 0.3, 'Assertiveness': 0.2}),
+    'Strategy': dict(common_weights, **{'Intellect': 0.3, 'Openness': 0.2, 'Assertiveness': 0.1}),
+    'Technology': dict(common_weights, **{'Intellect': 0.35, 'Openness': 0.15})
+}
+
+
+# This function indexes all employees by the recruiter that hired them. The hires are sorted by recruiter and hire date
+# and stored together with the cumulative time they spent in the company and the cumulative number of them that left,
+# so the employees hired by any recruiter up to any date are found with a lookup and a binary search. The time in the
+# company is counted up to the reference year
+def build_hires_index(employees_df, reference_year=reference_year):
+    hires_df = employees_df[employees_df['Recruiter ID'].notna() & (employees_df['Recruiter ID'] != 'NULL')]
+    time_in_company = (reference_year - hires_df['Time Left'].values.astype(int) -
+                       hires_df['Hire Year'].values.astype(int))
+    left = (hires_df['Time Left'].values != 0).astype(int)
+
+    # Every hire gets a single sortable key made of the position of its recruiter and the day it was hired
+    recruiters, recruiter_code = np.unique(hires_df['Recruiter ID'].values.astype(str), return_inverse=True)
+    hire_day = hires_df['Date Hired'].values.astype('datetime64[D]').astype(np.int64)
+    key = recruiter_code.astype(np.int64)*2**32 + hire_day + 2**31
+    order = np.argsort(key, kind='mergesort')
+    hires_index = {'Recruiters': recruiters,
+                   'Key': key[order],
+                   'Time in Company': np.concatenate([[0], np.cumsum(time_in_company[order])]),
+                   'Left': np.concatenate([[0], np.cumsum(left[order])])}
+    return hires_index
+
+
+# This function returns how many employees each recruiter hired up to a date, their total time in the company and how
+# many of them have left the company. All arguments are arrays, one element per (recruiter, date) question
+def hired_employees(hires_index, recruiter_ids, dates):
+    recruiters = hires_index['Recruiters']
+    recruiter_ids = np.asarray(recruiter_ids).astype(str)
+    recruiter_code = np.searchsorted(recruiters, recruiter_ids)
+    found = recruiter_code < len(recruiters)
+    found[found] = recruiters[recruiter_code[found]] == recruiter_ids[found]
+
+    day = np.asarray(dates).astype('datetime64[D]').astype(np.int64)
+    start = np.searchsorted(hires_index['Key'], recruiter_code.astype(np.int64)*2**32, side='left')
+    end = np.searchsorted(hires_index['Key'], recruiter_code.astype(np.int64)*2**32 + day + 2**31, side='right')
+    end = np.where(found, end, start)   # Employees that never recruited anyone have hired nobody
+    return (end - start, hires_index['Time in Company'][end] - hires_index['Time in Company'][start],
+            hires_index['Left'][end] - hires_index['Left'][start])
+
+
+# This function indexes the psychometric indicators of all employees by ID. The 64-bit hashes of the IDs are sorted
+# and the traits are kept as a single matrix in the same order, so the psychometrics of any employees are joined with
+# one binary search on integers
+def build_psychometric_index(psychometrics_df):
+    traits = [column for column in psychometrics_df.columns if column != 'ID']
+    keys = entity_counters(psychometrics_df['ID'])
+    order = np.argsort(keys, kind='mergesort')
+    return {'Keys': keys[order], 'Traits': traits, 'Scores': psychometrics_df[traits].to_numpy(dtype=float)[order]}
+
+
+# This function returns the psychometric matrix of the employees with the given IDs, one row per employee
+def employee_traits(psychometric_index, employee_ids):
+    keys = psychometric_index['Keys']
+    employee_keys = entity_counters(employee_ids)
+    position = np.searchsorted(keys, employee_keys)
+    missing = position == len(keys)
+    missing[~missing] = keys[position[~missing]] != employee_keys[~missing]
+    if missing.any():
+        raise ValueError("The employee with the ID '%s' has no psychometric indicators" %
+                         np.asarray(employee_ids, dtype=object)[missing][0])
+    return psychometric_index['Scores'][position]
+
+
+# This function scores the performance of evaluation records between 0 and 1 with the logistic model of a department,
+# where traits holds the psychometric matrix of the employee of every record. The weighted traits are summed record by
+# record, so the score of a record is the same no matter which other records are scored with it
+def performance_scores(traits, trait_names, department, streams, counters):
+    weights = np.array([performance_weights[department].get(trait, 0.0) for trait in trait_names])
+    logit = (performance_intercept + ((traits - 50)/10*weights).sum(axis=1) +
+             streams.normal('Performance Noise', counters, 0, performance_noise))
+    return 1/(1 + np.exp(-logit))
+
+
+# The performance scores of the evaluation records with the given IDs and years of a department
+def record_scores(ids, years, traits, trait_names, department, seed=seed):
+    return performance_scores(traits, trait_names, department, RandomStreams(seed, 'departments', department),
+                              entity_counters(ids, years))
+
+
+# This function expands employees into one evaluation record for each of their last (up to evaluated_years) years in
+# the company. It returns the position of the employee of every record and the calendar year of the record. With
+# first_year only the records of first_year and the later years are returned
+def evaluation_records(hire_year, time_left, reference_year=reference_year, first_year=None):
+    time_in_company = np.maximum(0, np.minimum(evaluated_years, reference_year - time_left - hire_year))
+    if first_year is not None:
+        time_in_company = np.minimum(time_in_company, np.maximum(0, reference_year - time_left - first_year + 1))
+    employee = np.repeat(np.arange(len(hire_year)), time_in_company)  # The employee of every evaluation record
+    year = np.arange(len(employee)) - np.repeat(np.cumsum(time_in_company) - time_in_company, time_in_company)
+    return employee, reference_year - time_left[employee] - year
+
+
+# This function looks up the employees hired by the employee of every evaluation record up to the start of the calendar
+# year of the record, once for all HR metrics that are calculated from them
+def year_hires(evaluation, hires_index):
+    start_of_year = (evaluation['Year'] - 1970).astype('datetime64[Y]')
+    hired, total_time, total_left = hired_employees(hires_index, evaluation['ID'], start_of_year)
+    return {'Hired': hired, 'Total Time': total_time, 'Left': total_left}
+
+
+# HR specific evaluation metrics, calculated from all employees hired by the specific employee up to the start of the
+# calendar year of the evaluation
+def hired_employees_time(evaluation, hires, streams, counters):
+    return hires['Total Time']
+
+
+def hired_employees_fired(evaluation, hires, streams, counters):
+    return (0.2*hires['Left']).astype(int)  # 20% of the recruits that left are considered fired
+
+
+def recruitment_time(evaluation, hires, streams, counters):
+    return np.round(streams.uniform('Average Recruitment Time(months)', counters, 1, 12), 2)
+
+
+# The department specific evaluation metrics. A metric is either drawn uniformly between its 2 limits or it is
+# calculated by a function of the evaluation records, the employees hired by the employee of every record (see
+# year_hires), the random streams of the department and the counters of the evaluation records
+department_metrics = {
+    'HR': {'Total Time of hired employees(years)': hired_employees_time,
+           'Average Recruitment Time(months)': recruitment_time,
+           'Employees Fired': hired_employees_fired},
+    'Sales': {'Total Sales': [1000, 100000], 'Clients Asking': [0, 5]},
+    'Product': {'Total Defects': [10, 50], 'Number of Complaining Customers': [0, 20]},
+    'Finance': {'Non - Servicing Obligactions': [0, 10000]},
+    'Legal': {'Successful Lawsuits': [0, 3], 'Disputes amicably resolved': [0, 6]},
+    'Strategy': {'Total Sales': [1000, 10000], 'Number of Teams': [1, 10], 'Number of Projects': [1, 20]},
+    'Technology': {'Problematic Code Commits': [0, 20]}
+}
+
+
+# This function calculates the annual evaluations of all employees of a department. Every employee is expanded into
+# one record for each of his/her last (up to evaluated_years) years in the company and all metrics are drawn as arrays.
+# Every metric has its own random stream in the department and the ID and year of a record are its counter, so the
+# evaluation of an employee in a year is the same no matter which other employees are evaluated with it. With
+# first_year only the records of first_year and the later years are calculated, e.g. the records of a new year.
+# With traits, the psychometric matrix of the employees of the department, the psychometric model is used instead: the
+# performance and bonus follow the scores of the records, and the percentiles are their ranks within every year of the
+# department, so they depend on the other employees evaluated in the same year. Percentiles that were ranked among more
+# employees than the ones evaluated here, e.g. by the employee lookup, can be given instead, one for every record
+def evaluate_department(employees_df, department, hires_index=None, seed=seed, reference_year=reference_year,
+                        first_year=None, traits=None, trait_names=None, percentiles=None):
+    # We only extract the useful information for our department to execute calculations faster
+    department_df = employees_df[employees_df['Department'] == department]
+    hire_year = department_df['Hire Year'].values.astype(int)
+    time_left = department_df['Time Left'].values.astype(int)
+    salary = department_df['Salary'].values.astype(int)
+
+    employee, year = evaluation_records(hire_year, time_left, reference_year, first_year)
 
-# ----------------------- Working with the Sales department ------------------------------------------------------------
-# We only extract the useful information for our department to execute calculations faster
-department_df = []
-department_df = employees_df[employees_df['Department'] == 'Sales'].reset_index()[['ID', 'Date Hired', 'Time Left',
-                                                                        'Salary', 'Working Experience', 'Recruiter ID']]
-all_evaluations = []   # Empty list to append the annual evaluations of the department employees
-for i in range(len(department_df)):
-    evaluation = {}
-    evaluation['ID'] = department_df.at[i, 'ID']
-    time_in_company = 2020 - department_df.at[i, 'Time Left'] - int(department_df.at[i, 'Date Hired'][0:4])
-
-    for year in range(min(5, time_in_company)):
-        calendar_year = 2020 - department_df.at[i, 'Time Left'] - year
-        evaluation['Year'] = calendar_year   # Calendar year of the specific evaluation record
-        evaluation['Loyalty'] = calendar_year - int(department_df.at[i, 'Date Hired'][0:4])  # Employee Loyalty
-        evaluation['Number of Promotions'] = int(evaluation['Loyalty']/4)   # Number of promotions of the employee
-        evaluation['Bonus'] = int(np.random.uniform(0, 30)/100*int(department_df.at[i, 'Salary']))   # Annual Bonus
-        evaluation['Overtime'] = int(np.random.uniform(0, 20) / 100 * 1816)  # Annual working hours are 1816
-        evaluation['Chargeability'] = int(np.random.uniform(0, 100))
-
-        percentile = np.random.uniform(0, 100)   # Randomly estimate the percentile of the employee within the department
-        if percentile < 15:
-            evaluation['Department Percentile'] = 'Bottom 15%'
-            evaluation['Performance'] = 'Low'
-        elif percentile > 85:
-            evaluation['Department Percentile'] = 'Top 15%'
-            evaluation['Performance'] = 'High'
-        else:
-            evaluation['Department Percentile'] = 'Mid 70%'
-            evaluation['Performance'] = evaluation_performance[str(int(np.random.uniform(1, 3)))]
-
-        # Sales specific evaluation metrics
-        evaluation['Total Sales'] = int(np.random.uniform(1000, 100000))
-        evaluation['Clients Asking'] = int(np.random.uniform(0, 5))
-        all_evaluations.append(evaluation.copy())
-
-sales_df = pd.DataFrame(all_evaluations)
-
-with pd.ExcelWriter(input_path, engine='openpyxl', mode='a') as writer:
-    sales_df.to_excel(writer,  index=False, sheet_name='Sales')
-writer.save()
-writer.close()
-# ------------------------------------------- Sales FINISHED -----------------------------------------------------------
-
-# ----------------------- Working with the Product department ---------------------------------------------------------#
-# We only extract the useful information for our department to execute calculations faster
-department_df = []
-department_df = employees_df[employees_df['Department'] == 'Product'].reset_index()[['ID', 'Date Hired', 'Time Left',
-                                                                        'Salary', 'Working Experience', 'Recruiter ID']]
-all_evaluations = []   # Empty list to append the annual evaluations of the department employees
-for i in range(len(department_df)):
-    evaluation = {}
-    evaluation['ID'] = department_df.at[i, 'ID']
-    time_in_company = 2020 - department_df.at[i, 'Time Left'] - int(department_df.at[i, 'Date Hired'][0:4])
-
-    for year in range(min(5, time_in_company)):
-        calendar_year = 2020 - department_df.at[i, 'Time Left'] - year
-        evaluation['Year'] = calendar_year   # Calendar year of the specific evaluation record
-        evaluation['Loyalty'] = calendar_year - int(department_df.at[i, 'Date Hired'][0:4])  # Employee Loyalty
-        evaluation['Number of Promotions'] = int(evaluation['Loyalty']/4)   # Number of promotions of the employee
-        evaluation['Bonus'] = int(np.random.uniform(0, 30)/100*int(department_df.at[i, 'Salary']))   # Annual Bonus
-        evaluation['Overtime'] = int(np.random.uniform(0, 20) / 100 * 1816)  # Annual working hours are 1816
-        evaluation['Chargeability'] = int(np.random.uniform(0, 100))
-
-        percentile = np.random.uniform(0, 100)   # Randomly estimate the percentile of the employee within the department
-        if percentile < 15:
-            evaluation['Department Percentile'] = 'Bottom 15%'
-            evaluation['Performance'] = 'Low'
-        elif percentile > 85:
-            evaluation['Department Percentile'] = 'Top 15%'
-            evaluation['Performance'] = 'High'
-        else:
-            evaluation['Department Percentile'] = 'Mid 70%'
-            evaluation['Performance'] = evaluation_performance[str(int(np.random.uniform(1, 3)))]
-
-        # Product specific evaluation metrics
-        evaluation['Total Defects'] = int(np.random.uniform(10, 50))
-        evaluation['Number of Complaining Customers'] = int(np.random.uniform(0, 20))
-        all_evaluations.append(evaluation.copy())
-
-product_df = pd.DataFrame(all_evaluations)
-
-with pd.ExcelWriter(input_path, engine='openpyxl', mode='a') as writer:
-    product_df.to_excel(writer,  index=False, sheet_name='Product')
-writer.save()
-writer.close()
-# ------------------------------------------- Product FINISHED ---------------------------------------------------------
-
-# ----------------------- Working with the Finance department ---------------------------------------------------------#
-# We only extract the useful information for our department to execute calculations faster
-department_df = []
-department_df = employees_df[employees_df['Department'] == 'Finance'].reset_index()[['ID', 'Date Hired', 'Time Left',
-                                                                        'Salary', 'Working Experience', 'Recruiter ID']]
-all_evaluations = []   # Empty list to append the annual evaluations of the department employees
-for i in range(len(department_df)):
-    evaluation = {}
-    evaluation['ID'] = department_df.at[i, 'ID']
-    time_in_company = 2020 - department_df.at[i, 'Time Left'] - int(department_df.at[i, 'Date Hired'][0:4])
-
-    for year in range(min(5, time_in_company)):
-        calendar_year = 2020 - department_df.at[i, 'Time Left'] - year
-        evaluation['Year'] = calendar_year   # Calendar year of the specific evaluation record
-        evaluation['Loyalty'] = calendar_year - int(department_df.at[i, 'Date Hired'][0:4])  # Employee Loyalty
-        evaluation['Number of Promotions'] = int(evaluation['Loyalty']/4)   # Number of promotions of the employee
-        evaluation['Bonus'] = int(np.random.uniform(0, 30)/100*int(department_df.at[i, 'Salary']))   # Annual Bonus
-        evaluation['Overtime'] = int(np.random.uniform(0, 20) / 100 * 1816)  # Annual working hours are 1816
-        evaluation['Chargeability'] = int(np.random.uniform(0, 100))
-
-        percentile = np.random.uniform(0, 100)   # Randomly estimate the percentile of the employee within the department
-        if percentile < 15:
-            evaluation['Department Percentile'] = 'Bottom 15%'
-            evaluation['Performance'] = 'Low'
-        elif percentile > 85:
-            evaluation['Department Percentile'] = 'Top 15%'
-            evaluation['Performance'] = 'High'
-        else:
-            evaluation['Department Percentile'] = 'Mid 70%'
-            evaluation['Performance'] = evaluation_performance[str(int(np.random.uniform(1, 3)))]
-
-        # Finance specific evaluation metrics
-        evaluation['Non - Servicing Obligactions'] = int(np.random.uniform(0, 10000))
-        all_evaluations.append(evaluation.copy())
-
-finance_df = pd.DataFrame(all_evaluations)
-
-with pd.ExcelWriter(input_path, engine='openpyxl', mode='a') as writer:
-    finance_df.to_excel(writer,  index=False, sheet_name='Finance')
-writer.save()
-writer.close()
-# ------------------------------------------- Finance FINISHED ---------------------------------------------------------
-
-# ----------------------- Working with the Legal department ---------------------------------------------------------#
-# We only extract the useful information for our department to execute calculations faster
-department_df = []
-department_df = employees_df[employees_df['Department'] == 'Legal'].reset_index()[['ID', 'Date Hired', 'Time Left',
-                                                                        'Salary', 'Working Experience', 'Recruiter ID']]
-all_evaluations = []   # Empty list to append the annual evaluations of the department employees
-for i in range(len(department_df)):
     evaluation = {}
-    evaluation['ID'] = department_df.at[i, 'ID']
-    time_in_company = 2020 - department_df.at[i, 'Time Left'] - int(department_df.at[i, 'Date Hired'][0:4])
-
-    for year in range(min(5, time_in_company)):
-        calendar_year = 2020 - department_df.at[i, 'Time Left'] - year
-        evaluation['Year'] = calendar_year   # Calendar year of the specific evaluation record
-        evaluation['Loyalty'] = calendar_year - int(department_df.at[i, 'Date Hired'][0:4])  # Employee Loyalty
-        evaluation['Number of Promotions'] = int(evaluation['Loyalty']/4)   # Number of promotions of the employee
-        evaluation['Bonus'] = int(np.random.uniform(0, 30)/100*int(department_df.at[i, 'Salary']))   # Annual Bonus
-        evaluation['Overtime'] = int(np.random.uniform(0, 20) / 100 * 1816)  # Annual working hours are 1816
-        evaluation['Chargeability'] = int(np.random.uniform(0, 100))
-
-        percentile = np.random.uniform(0, 100)   # Randomly estimate the percentile of the employee within the department
-        if percentile < 15:
-            evaluation['Department Percentile'] = 'Bottom 15%'
-            evaluation['Performance'] = 'Low'
-        elif percentile > 85:
-            evaluation['Department Percentile'] = 'Top 15%'
-            evaluation['Performance'] = 'High'
+    evaluation['ID'] = department_df['ID'].values[employee]
+    evaluation['Year'] = year   # Calendar year of the specific evaluation record
+    streams = RandomStreams(seed, 'departments', department)
+    counters = entity_counters(evaluation['ID'], evaluation['Year'])
+    evaluation['Loyalty'] = evaluation['Year'] - hire_year[employee]  # Employee Loyalty
+    evaluation['Number of Promotions'] = (evaluation['Loyalty']/4).astype(int)   # Number of promotions of the employee
+    if traits is None:
+        bonus = streams.uniform('Bonus', counters, 0, 30)
+    else:
+        score = performance_scores(traits[employee], trait_names, department, streams, counters)
+        bonus = 30*score
+    evaluation['Bonus'] = (bonus/100*salary[employee]).astype(int)  # Annual Bonus
+    evaluation['Overtime'] = (streams.uniform('Overtime', counters, 0, 20)/100*1816).astype(int)  # Annual hours: 1816
+    evaluation['Chargeability'] = streams.uniform('Chargeability', counters, 0, 100).astype(int)
+
+    if traits is None:
+        # Randomly estimate the percentile of the employee within the department. The employees in the middle 70% get a
+        # Low or Medium performance at random
+        percentile = streams.uniform('Department Percentile', counters, 0, 100)
+        mid_performance = np.array([evaluation_performance['1'], evaluation_performance['2']])[
+            streams.uniform('Performance', counters, 1, 3).astype(int) - 1]
+    else:
+        # The percentile of every record is the rank of its score among the records of the same year, and the lower
+        # half of the middle 70% gets a Low performance
+        percentile = percentiles
+        if percentile is None:
+            percentile = 100*pd.Series(score).groupby(evaluation['Year']).rank(pct=True).values
+        mid_performance = np.where(percentile < 50, evaluation_performance['1'], evaluation_performance['2'])
+    evaluation['Department Percentile'] = np.where(percentile < 15, 'Bottom 15%',
+                                                   np.where(percentile > 85, 'Top 15%', 'Mid 70%'))
+    evaluation['Performance'] = np.where(percentile < 15, evaluation_performance['1'],
+                                         np.where(percentile > 85, evaluation_performance['3'], mid_performance))
+
+    # Department specific evaluation metrics
+    hires = None
+    if needs_hires_index(department):
+        if hires_index is None:
+            hires_index = build_hires_index(employees_df, reference_year)
+        hires = year_hires(evaluation, hires_index)
+    for metric, spec in department_metrics[department].items():
+        if callable(spec):
+            evaluation[metric] = spec(evaluation, hires, streams, counters)
         else:
-            evaluation['Department Percentile'] = 'Mid 70%'
-            evaluation['Performance'] = evaluation_performance[str(int(np.random.uniform(1, 3)))]
-
-        # Legal specific evaluation metrics
-        evaluation['Successful Lawsuits'] = int(np.random.uniform(0, 3))
-        evaluation['Disputes amicably resolved'] = int(np.random.uniform(0, 6))
-        all_evaluations.append(evaluation.copy())
-
-legal_df = pd.DataFrame(all_evaluations)
-
-with pd.ExcelWriter(input_path, engine='openpyxl', mode='a') as writer:
-    legal_df.to_excel(writer,  index=False, sheet_name='Legal')
-writer.save()
-writer.close()
-# ------------------------------------------- Legal FINISHED ---------------------------------------------------------
-
-# ----------------------- Working with the Strategy department --------------------------------------------------------#
-# We only extract the useful information for our department to execute calculations faster
-department_df = []
-department_df = employees_df[employees_df['Department'] == 'Strategy'].reset_index()[['ID', 'Date Hired', 'Time Left',
-                                                                        'Salary', 'Working Experience', 'Recruiter ID']]
-all_evaluations = []   # Empty list to append the annual evaluations of the department employees
-for i in range(len(department_df)):
-    evaluation = {}
-    evaluation['ID'] = department_df.at[i, 'ID']
-    time_in_company = 2020 - department_df.at[i, 'Time Left'] - int(department_df.at[i, 'Date Hired'][0:4])
-
-    for year in range(min(5, time_in_company)):
-        calendar_year = 2020 - department_df.at[i, 'Time Left'] - year
-        evaluation['Year'] = calendar_year   # Calendar year of the specific evaluation record
-        evaluation['Loyalty'] = calendar_year - int(department_df.at[i, 'Date Hired'][0:4])  # Employee Loyalty
-        evaluation['Number of Promotions'] = int(evaluation['Loyalty']/4)   # Number of promotions of the employee
-        evaluation['Bonus'] = int(np.random.uniform(0, 30)/100*int(department_df.at[i, 'Salary']))   # Annual Bonus
-        evaluation['Overtime'] = int(np.random.uniform(0, 20) / 100 * 1816)  # Annual working hours are 1816
-        evaluation['Chargeability'] = int(np.random.uniform(0, 100))
-
-        percentile = np.random.uniform(0, 100)   # Randomly estimate the percentile of the employee within the department
-        if percentile < 15:
-            evaluation['Department Percentile'] = 'Bottom 15%'
-            evaluation['Performance'] = 'Low'
-        elif percentile > 85:
-            evaluation['Department Percentile'] = 'Top 15%'
-            evaluation['Performance'] = 'High'
-        else:
-            evaluation['Department Percentile'] = 'Mid 70%'
-            evaluation['Performance'] = evaluation_performance[str(int(np.random.uniform(1, 3)))]
-
-        # Strategy specific evaluation metrics
-        evaluation['Total Sales'] = int(np.random.uniform(1000, 10000))
-        evaluation['Number of Teams'] = int(np.random.uniform(1, 10))
-        evaluation['Number of Projects'] = int(np.random.uniform(1, 20))
-        all_evaluations.append(evaluation.copy())
-
-strategy_df = pd.DataFrame(all_evaluations)
-
-with pd.ExcelWriter(input_path, engine='openpyxl', mode='a') as writer:
-    strategy_df.to_excel(writer,  index=False, sheet_name='Strategy')
-writer.save()
-writer.close()
-# ------------------------------------------- Strategy FINISHED --------------------------------------------------------
-
-# ----------------------- Working with the Technology department ------------------------------------------------------#
-# We only extract the useful information for our department to execute calculations faster
-department_df = []
-department_df = employees_df[employees_df['Department'] == 'Technology'].reset_index()[['ID', 'Date Hired', 'Time Left',
-                                                                        'Salary', 'Working Experience', 'Recruiter ID']]
-all_evaluations = []   # Empty list to append the annual evaluations of the department employees
-for i in range(len(department_df)):
-    evaluation = {}
-    evaluation['ID'] = department_df.at[i, 'ID']
-    time_in_company = 2020 - department_df.at[i, 'Time Left'] - int(department_df.at[i, 'Date Hired'][0:4])
-
-    for year in range(min(5, time_in_company)):
-        calendar_year = 2020 - department_df.at[i, 'Time Left'] - year
-        evaluation['Year'] = calendar_year   # Calendar year of the specific evaluation record
-        evaluation['Loyalty'] = calendar_year - int(department_df.at[i, 'Date Hired'][0:4])  # Employee Loyalty
-        evaluation['Number of Promotions'] = int(evaluation['Loyalty']/4)   # Number of promotions of the employee
-        evaluation['Bonus'] = int(np.random.uniform(0, 30)/100*int(department_df.at[i, 'Salary']))   # Annual Bonus
-        evaluation['Overtime'] = int(np.random.uniform(0, 20) / 100 * 1816)  # Annual working hours are 1816
-        evaluation['Chargeability'] = int(np.random.uniform(0, 100))
-
-        percentile = np.random.uniform(0, 100)   # Randomly estimate the percentile of the employee within the department
-        if percentile < 15:
-            evaluation['Department Percentile'] = 'Bottom 15%'
-            evaluation['Performance'] = 'Low'
-        elif percentile > 85:
-            evaluation['Department Percentile'] = 'Top 15%'
-            evaluation['Performance'] = 'High'
-        else:
-            evaluation['Department Percentile'] = 'Mid 70%'
-            evaluation['Performance'] = evaluation_performance[str(int(np.random.uniform(1, 3)))]
-
-        # Technology specific evaluation metrics
-        evaluation['Problematic Code Commits'] = int(np.random.uniform(0, 20))
-        all_evaluations.append(evaluation.copy())
-
-technology_df = pd.DataFrame(all_evaluations)
-
-with pd.ExcelWriter(input_path, engine='openpyxl', mode='a') as writer:
-    technology_df.to_excel(writer,  index=False, sheet_name='Technology')
-writer.save()
-writer.close()
-# ------------------------------------------- Strategy FINISHED --------------------------------------------------------
+            evaluation[metric] = streams.uniform(metric, counters, spec[0], spec[1]).astype(int)
+
+    return apply_schema(pd.DataFrame(evaluation), department)
+
+
+# The department specific metrics that are calculated by functions need the index of hired employees
+def needs_hires_index(department):
+    return any(callable(spec) for spec in department_metrics[department].values())
+
+
+# This function evaluates all departments, in parallel when more than 1 worker is requested. Every department has its
+# own random streams derived from the seed, so the evaluations are the same for any number of workers and any order in
+# which the departments are evaluated. Departments evaluated by other processes are not timed one by one. With
+# first_year only the records of first_year and the later years are calculated, but the hires index still covers all
+# employees. With psychometrics_df the psychometric model is used and the psychometrics of every department are joined
+# once, before its employees are sent to the process that evaluates it
+def evaluate_all_departments(employees_df, number_workers=1, seed=seed, reference_year=reference_year, first_year=None,
+                             psychometrics_df=None):
+    departments = list(department_metrics.keys())
+    with span('hires index', len(employees_df)):
+        hires_index = build_hires_index(employees_df, reference_year)
+
+    # Only the employees and the columns that a department needs are sent to the process that evaluates it. Employees
+    # that left before first_year have no records to calculate
+    evaluated_df = employees_df
+    if first_year is not None:
+        evaluated_df = employees_df[employees_df['Time Left'].values <= reference_year - first_year]
+    columns = ['ID', 'Hire Year', 'Time Left', 'Salary', 'Department']
+    department_dfs = [evaluated_df[evaluated_df['Department'] == department][columns] for department in departments]
+    hires_indexes = [hires_index if needs_hires_index(department) else None for department in departments]
+    department_traits = [None]*len(departments)
+    trait_names = None
+    if psychometrics_df is not None:
+        with span('psychometric index', len(psychometrics_df)):
+            psychometric_index = build_psychometric_index(psychometrics_df)
+            department_traits = [employee_traits(psychometric_index, department_df['ID']) for department_df
+                                 in department_dfs]
+        trait_names = psychometric_index['Traits']
+
+    if number_workers > 1:
+        with ProcessPoolExecutor(max_workers=number_workers) as executor:
+            evaluations = list(executor.map(evaluate_department, department_dfs, departments, hires_indexes,
+                                            [seed]*len(departments), [reference_year]*len(departments),
+                                            [first_year]*len(departments), department_traits,
+                                            [trait_names]*len(departments)))
+    else:
+        evaluations = []
+        for department_df, department, department_hires_index, traits in zip(department_dfs, departments,
+                                                                              hires_indexes, department_traits):
+            with span(department, len(department_df)):
+                evaluations.append(evaluate_department(department_df, department, department_hires_index, seed,
+                                                       reference_year, first_year, traits, trait_names))
+    return dict(zip(departments, evaluations))
+
+
+if __name__ == '__main__':
+    employees_df = read_table(input_path, 'Professional_Profile', input_format)
+    psychometrics_df = None
+    if evaluation_model == 'psychometric':
+        psychometrics_df = read_table(input_path, 'Psychometric_Indicators', input_format)
+    department_evaluations = evaluate_all_departments(employees_df, number_workers, psychometrics_df=psychometrics_df)
+
+    write_tables(department_evaluations, input_path, input_format)   # All departments are added in a single write
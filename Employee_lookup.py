@@ -0,0 +1,206 @@
+import argparse
+import functools
+import json
+import numpy as np
+import pandas as pd
+import Personal_Profile
+import Departments
+import Noise_insertion
+import Pipeline
+
+# Every random value of an employee only depends on the seed and the index of the employee, so a single employee of a
+# data set is regenerated on its own from the parameters of the run that generated the data set. The profile, the
+# psychometrics and the evaluations of an employee are drawn in constant time. Only the recruiter of an employee and,
+# for an HR employee, the employees he/she hired depend on the other employees. They are found by scanning the
+# population block by block, where only the fields the department, the hire date and the recruiter of an employee
+# depend on are drawn again. A lookup of any number of employees scans the population at most twice. In the
+# psychometric evaluation model the department percentiles are ranks among all records of a department and year, so the
+# first scan also scores the records of the departments of the regenerated employees and ranks their records
+
+
+# This function returns the index of the employee with the given ID. The IDs are generated block by block until the ID
+# is found, without generating any other field
+def find_employee_index(employee_id, number_employees, block_size=Personal_Profile.block_size,
+                        seed=Personal_Profile.seed):
+    for first_index in range(0, number_employees, block_size):
+        employee_ids = Personal_Profile.generate_ids(min(block_size, number_employees - first_index), first_index, seed)
+        found = np.flatnonzero(employee_ids == employee_id)
+        if len(found):
+            return first_index + int(found[0])
+    raise ValueError("None of the %d employees has the ID '%s'" % (number_employees, employee_id))
+
+
+# This function adds the records of the employees with the given indexes to the ranks of the target records of every
+# department in targets. The rank of a target record counts the records of the same department and year with a lower
+# and with an equal performance score, and all records of the department and year. It is called for every block of the
+# scan of the recruiter index
+def rank_records(targets, index, department_position, seed=Personal_Profile.seed,
+                 reference_year=Personal_Profile.reference_year):
+    department_names = list(Personal_Profile.departments.keys())
+    for department, target in targets.items():
+        department_index = index[department_position == department_names.index(department)]
+        career = Personal_Profile.career_data(department_index, seed, reference_year)
+        employee, years = Departments.evaluation_records(career['year_hire'], career['time_left'], reference_year)
+        traits = Personal_Profile.psychometric_scores(department_index, seed).astype(float)[employee]
+        ids = Personal_Profile.employee_ids(department_index, seed)[employee]
+        scores = Departments.record_scores(ids, years, traits, Personal_Profile.psychometric_traits, department, seed)
+        for year in np.unique(target['Year']):
+            year_records = target['Year'] == year
+            year_scores = np.sort(scores[years == year])
+            lower = np.searchsorted(year_scores, target['Score'][year_records], side='left')
+            target['Lower'][year_records] += lower
+            target['Equal'][year_records] += np.searchsorted(year_scores, target['Score'][year_records],
+                                                             side='right') - lower
+            target['Total'][year_records] += len(year_scores)
+
+
+# This function scans the population for the employees that were hired by the recruiters with the given indexes and
+# returns their hires index, which the HR evaluations of the recruiters need. The hires of all recruiters are found in a
+# single pass
+def scan_hires_index(recruiters, recruiter_index, number_employees, seed=Personal_Profile.seed,
+                     block_size=Personal_Profile.block_size, reference_year=Personal_Profile.reference_year):
+    positions = np.flatnonzero(np.isin(recruiter_index['Index'], recruiters))
+    hires_dfs = []
+    for first_index in range(0, number_employees, block_size):
+        index = np.arange(first_index, min(first_index + block_size, number_employees))
+        career = Personal_Profile.career_data(index, seed, reference_year)
+        recruiter = Personal_Profile.recruiter_positions(career['date_hired'], recruiter_index, seed, index)
+        hired = np.isin(recruiter, positions)
+        hires_dfs.append(pd.DataFrame({'Recruiter': recruiter_index['Index'][recruiter[hired]],
+                                       'Date Hired': career['date_hired'][hired],
+                                       'Hire Year': career['year_hire'][hired],
+                                       'Time Left': career['time_left'][hired]}))
+    hires_df = pd.concat(hires_dfs, ignore_index=True)
+    hires_df['Recruiter ID'] = Personal_Profile.employee_ids(hires_df['Recruiter'].values, seed)
+    return Departments.build_hires_index(hires_df, reference_year)
+
+
+# This function regenerates the employees with the given indexes of a population of number_employees employees and
+# returns, for every employee, his/her Professional_Profile row, Psychometric_Indicators row and the evaluation rows of
+# his/her department, as a dictionary of tables like the one of the data set
+def regenerate_employees(indexes, number_employees, seed=Personal_Profile.seed, block_size=Personal_Profile.block_size,
+                         locale=Personal_Profile.locale, reference_year=Personal_Profile.reference_year,
+                         evaluation_model=Departments.evaluation_model):
+    for index in indexes:
+        if not 0 <= index < number_employees:
+            raise ValueError('The index %d is not the index of one of the %d employees' % (index, number_employees))
+    employees = [Personal_Profile.generate_employees(1, seed, index, locale, reference_year) for index in indexes]
+
+    # In the psychometric model the records of every regenerated employee are scored before the scan of the population,
+    # which ranks them among the records of his/her department. records holds the positions of the records of every
+    # employee among the target records of his/her department
+    targets, records = {}, []
+    for employee_df, psychometrics_df in employees:
+        department = employee_df['Department'].iloc[0]
+        target = targets.setdefault(department, {'Year': np.zeros(0, dtype=int), 'Score': np.zeros(0)})
+        if evaluation_model == 'psychometric':
+            employee, years = Departments.evaluation_records(employee_df['Hire Year'].values.astype(int),
+                                                             employee_df['Time Left'].values.astype(int),
+                                                             reference_year)
+            traits = psychometrics_df[Personal_Profile.psychometric_traits].to_numpy(dtype=float)[employee]
+            scores = Departments.record_scores(employee_df['ID'].values[employee], years, traits,
+                                               Personal_Profile.psychometric_traits, department, seed)
+            records.append(slice(len(target['Year']), len(target['Year']) + len(years)))
+            target['Year'] = np.concatenate([target['Year'], years])
+            target['Score'] = np.concatenate([target['Score'], scores])
+    if evaluation_model == 'psychometric':
+        for target in targets.values():
+            target.update({rank: np.zeros(len(target['Year']), dtype=np.int64) for rank in ['Lower', 'Equal', 'Total']})
+    else:
+        targets = None
+
+    rank_block = functools.partial(rank_records, targets, seed=seed, reference_year=reference_year) if targets else None
+    recruiter_index = Personal_Profile.scan_recruiter_index(number_employees, seed, block_size, reference_year,
+                                                            rank_block)
+    employees = [(Personal_Profile.assign_recruiters(employee_df, recruiter_index, seed, index, locale),
+                  psychometrics_df) for index, (employee_df, psychometrics_df) in zip(indexes, employees)]
+
+    recruiters = [index for index, (employee_df, psychometrics_df) in zip(indexes, employees)
+                  if Departments.needs_hires_index(employee_df['Department'].iloc[0])]
+    hires_index = None
+    if recruiters:
+        hires_index = scan_hires_index(recruiters, recruiter_index, number_employees, seed, block_size, reference_year)
+
+    employee_tables = []
+    for number, (employee_df, psychometrics_df) in enumerate(employees):
+        department = employee_df['Department'].iloc[0]
+        traits, trait_names, percentiles = None, None, None
+        if evaluation_model == 'psychometric':
+            # The average rank of a record among the records with an equal score, as a percentage of all records
+            target = targets[department]
+            rank = target['Lower'][records[number]] + (target['Equal'][records[number]] + 1)/2
+            percentiles = 100*rank/target['Total'][records[number]]
+            traits = psychometrics_df[Personal_Profile.psychometric_traits].to_numpy(dtype=float)
+            trait_names = Personal_Profile.psychometric_traits
+        evaluation_df = Departments.evaluate_department(employee_df, department, hires_index, seed, reference_year,
+                                                        traits=traits, trait_names=trait_names,
+                                                        percentiles=percentiles)
+        employee_tables.append({'Professional_Profile': employee_df, 'Psychometric_Indicators': psychometrics_df,
+                                department: evaluation_df})
+    return employee_tables
+
+
+# This function regenerates a single employee, like regenerate_employees
+def regenerate_employee(index, number_employees, seed=Personal_Profile.seed, block_size=Personal_Profile.block_size,
+                        locale=Personal_Profile.locale, reference_year=Personal_Profile.reference_year,
+                        evaluation_model=Departments.evaluation_model):
+    return regenerate_employees([index], number_employees, seed, block_size, locale, reference_year,
+                                evaluation_model)[0]
+
+
+# The noisy variant of the tables of a regenerated employee. The noise of a record only depends on the noise seed and
+# the record, so it is the same as in the noisy data set and a record that was dropped there is dropped here too
+def regenerate_noisy_employee(tables, config):
+    return Noise_insertion.noisy_data_set(tables, config['noise_seed'], config['nan_percentage'],
+                                          config['typographic_percentage'], config['confusion_percentage'],
+                                          config['drop_percentage'], config['locale'])
+
+
+# The parameters of the lookup are the ones of the pipeline run that generated the data set, read from the same json
+# config file, and can be changed by the command line arguments
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description='Regenerate single employees of a data set, with their profile, '
+                                                 'psychometrics and evaluations and optionally their noisy version, '
+                                                 'without generating the whole data set.')
+    parser.add_argument('employees', nargs='+', help='indexes (0 is the first employee) or IDs of the employees')
+    parser.add_argument('--config', help='json config file of the pipeline run that generated the data set')
+    parser.add_argument('--number-employees', type=int, help='total number of employees of the data set')
+    parser.add_argument('--seed', type=int, help='seed of the employee generation and the department evaluations')
+    parser.add_argument('--noise-seed', type=int, help='seed of the noise insertion')
+    parser.add_argument('--block-size', type=int, help='number of employees generated at once when the population is '
+                                                       'scanned')
+    parser.add_argument('--locale', help="Faker locale of the employee names, e.g. 'en_US' or 'de_DE'")
+    parser.add_argument('--reference-year', type=int, help='current year of the data set')
+    parser.add_argument('--evaluation-model', choices=['random', 'psychometric'],
+                        help='evaluation model of the data set')
+    parser.add_argument('--noisy', action='store_true', help='also show the noisy version of the records')
+    args = parser.parse_args(arguments)
+
+    config = Pipeline.default_config()
+    if args.config is not None:
+        with open(args.config) as config_file:
+            config.update(json.load(config_file))
+    config.update({key: value for key, value in vars(args).items() if key in config and value is not None})
+    return args.employees, args.noisy, config
+
+
+if __name__ == '__main__':
+    employees, noisy, config = parse_arguments()
+    indexes = [int(employee) if employee.isdigit() else find_employee_index(employee, config['number_employees'],
+                                                                             config['block_size'], config['seed'])
+               for employee in employees]
+    employee_tables = regenerate_employees(indexes, config['number_employees'], config['seed'], config['block_size'],
+                                           config['locale'], config['reference_year'], config['evaluation_model'])
+    for index, tables in zip(indexes, employee_tables):
+        versions = [('', tables)] + ([(' (noisy)', regenerate_noisy_employee(tables, config))] if noisy else [])
+        print('Employee %d' % index)
+        for version, version_tables in versions:
+            for table, df in version_tables.items():
+                print('\n%s%s:' % (table, version))
+                if df.empty:
+                    print('dropped')
+                elif len(df) == 1:
+                    print(df.T.to_string(header=False))
+                else:
+                    print(df.to_string(index=False))
+        print()
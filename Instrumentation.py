@@ -0,0 +1,120 @@
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:   # The resource module does not exist on windows, where the memory is not sampled
+    resource = None
+
+sampling_interval = 0.05   # Seconds between 2 samples of the memory of the process
+profile_functions = 30     # Number of the slowest functions that are added to the run report when profiling
+
+# The state of the run that is instrumented. Without a started run the spans do nothing, so the stages can be timed
+# without slowing down the scripts when they run on their own
+run = None
+
+
+# This function returns the memory that the process currently uses, in bytes
+def current_memory():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024   # The peak so far, where nothing better exists
+
+
+# The memory is sampled by a background thread, which keeps the highest memory since the last span was opened
+def sample_memory(state):
+    while not state['stop'].wait(sampling_interval):
+        state['peak_memory'] = max(state['peak_memory'], current_memory())
+
+
+# This function starts an instrumented run. With profile the whole run is also profiled with cProfile
+def start_run(profile=False):
+    global run
+    memory = current_memory()
+    run = {'started': datetime.datetime.now().isoformat(timespec='seconds'), 'start': time.perf_counter(),
+           'spans': {}, 'stack': [], 'peak_memory': memory, 'start_memory': memory, 'stop': threading.Event(),
+           'profiler': None}
+    run['sampler'] = threading.Thread(target=sample_memory, args=(run,), daemon=True)
+    run['sampler'].start()
+    if profile:
+        import cProfile
+        run['profiler'] = cProfile.Profile()
+        run['profiler'].enable()
+
+
+# This context manager times a stage or a sub-step of the run and counts the rows it processed. Spans can be nested and
+# the spans with the same path, e.g. 'generation/psychometrics' of every block, are added up in the report
+@contextlib.contextmanager
+def span(name, rows=None):
+    if run is None:
+        yield
+        return
+    run['stack'].append(name)
+    path = '/'.join(run['stack'])
+    outer_peak = run['peak_memory']
+    run['peak_memory'] = current_memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        peak_memory = max(run['peak_memory'], current_memory())
+        run['peak_memory'] = max(outer_peak, peak_memory)
+        run['stack'].pop()
+        record = run['spans'].setdefault(path, {'span': path, 'calls': 0, 'seconds': 0.0, 'rows': 0,
+                                                'peak_memory_mb': 0.0, 'first_start': start - run['start']})
+        record['calls'] += 1
+        record['seconds'] += seconds
+        record['rows'] += rows or 0
+        record['peak_memory_mb'] = max(record['peak_memory_mb'], peak_memory/2**20)
+
+
+# This function ends the instrumented run and writes its report as json. When the run was profiled, the profile is
+# dumped next to the report and its slowest functions are added to the report
+def finish_run(report_path, config=None):
+    global run
+    finished_run, run = run, None
+    if finished_run is None:
+        return None
+    finished_run['stop'].set()
+    finished_run['sampler'].join()
+
+    spans = []
+    for record in sorted(finished_run['spans'].values(), key=lambda record: record['first_start']):
+        record = dict(record)
+        record['rows_per_second'] = round(record['rows']/record['seconds'], 1) if record['rows'] else None
+        record['seconds'] = round(record['seconds'], 6)
+        record['peak_memory_mb'] = round(record['peak_memory_mb'], 1)
+        record['first_start'] = round(record['first_start'], 6)
+        spans.append(record)
+
+    report = {'started': finished_run['started'], 'seconds': round(time.perf_counter() - finished_run['start'], 6),
+              'start_memory_mb': round(finished_run['start_memory']/2**20, 1),
+              'peak_memory_mb': round(max([finished_run['peak_memory']/2**20] +
+                                          [record['peak_memory_mb'] for record in spans]), 1),
+              'config': config, 'spans': spans}
+
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    if finished_run['profiler'] is not None:
+        import pstats
+        finished_run['profiler'].disable()
+        profile_path = os.path.splitext(report_path)[0] + '.pstats'
+        finished_run['profiler'].dump_stats(profile_path)
+        statistics = pstats.Stats(finished_run['profiler']).sort_stats('cumulative')
+        report['profile'] = {'file': profile_path, 'functions': [
+            {'function': '%s:%d(%s)' % function, 'calls': statistics.stats[function][1],
+             'own_seconds': round(statistics.stats[function][2], 6),
+             'cumulative_seconds': round(statistics.stats[function][3], 6)}
+            for function in statistics.fcn_list[:profile_functions]]}
+
+    with open(report_path, 'w') as report_file:
+        json.dump(report, report_file, indent=2, default=str)
+    return report
@@ -0,0 +1,51 @@
+import importlib
+import numpy as np
+import pandas as pd
+
+default_locale = 'en_US'   # The Faker locale whose names are used when no other locale is given
+name_pools = {}   # The name pools of every locale that has been loaded, so each locale is loaded only once
+
+
+# This function turns a list of Faker names into a pool of names and their cumulative distribution. Faker stores the
+# names of some locales with their weights and the names of the others without, in which case all names are equally
+# likely. The pool also holds the sorted distinct names and the position of every name among them, so drawn names can
+# be stored as categorical codes
+def build_name_pool(names):
+    if isinstance(names, dict):
+        weights = np.array(list(names.values()), dtype=float)
+    else:
+        weights = np.ones(len(names))
+    cdf = np.cumsum(weights)
+    names = np.array(list(names), dtype=object)
+    categories, codes = np.unique(names.astype(str), return_inverse=True)
+    return {'Names': names, 'CDF': cdf/cdf[-1], 'Dtype': pd.CategoricalDtype(categories), 'Codes': codes}
+
+
+# This function returns the first and last name pools of a locale. The names are read once from the Faker person
+# provider of the locale, without loading the rest of Faker
+def get_name_pools(locale=default_locale):
+    if locale not in name_pools:
+        provider = importlib.import_module('faker.providers.person.' + locale).Provider
+        name_pools[locale] = {'First Name': build_name_pool(provider.first_names),
+                              'Last Name': build_name_pool(provider.last_names)}
+    return name_pools[locale]
+
+
+# This function turns an array of uniform values into the positions of first or last names (column is 'First Name' or
+# 'Last Name') in the pool of the locale, by a single weighted search
+def name_positions(uniforms, column, locale=default_locale):
+    pool = get_name_pools(locale)[column]
+    return np.minimum(np.searchsorted(pool['CDF'], uniforms, side='right'), len(pool['Names']) - 1)
+
+
+# This function turns an array of uniform values into first or last names
+def draw_names(uniforms, column, locale=default_locale):
+    return get_name_pools(locale)[column]['Names'][name_positions(uniforms, column, locale)]
+
+
+# This function draws the same names as draw_names, as a categorical whose categories are all distinct names of the
+# pool. It is built from the codes of the names, without a string for every name, and every block of names drawn from
+# a pool has the same categories
+def draw_name_categories(uniforms, column, locale=default_locale):
+    pool = get_name_pools(locale)[column]
+    return pd.Categorical.from_codes(pool['Codes'][name_positions(uniforms, column, locale)], dtype=pool['Dtype'])
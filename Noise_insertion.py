@@ -1,27 +1,31 @@
 import numpy as np
 import pandas as pd
-from faker import Faker
-import random
 import sys
-import xlwt
-#import xlrd
-import openpyxl
+import os
 import string
+from concurrent.futures import ThreadPoolExecutor
+from Storage import read_table, write_tables, read_chunks, table_path, TableWriter
+from Name_pools import default_locale, draw_names
+from Schema import apply_schema, plain_columns, nullable_dtypes, manifest_schema
+from Instrumentation import span
+from Random_streams import RandomStreams, CachedStreams, entity_counters
 
 folder_path = sys.path[0]
-input_path = folder_path + '\\employees.xlsx'  # Name of the input file
-output_path = folder_path + '\\noisy_employees.xlsx'  # Name of the output file
-# There is a number of different seed functions that should be specified to produce a controlled and consistent output
-fake = Faker()
-Faker.seed(1321)
+input_path = os.path.join(folder_path, 'employees')  # Name of the input data set
+output_path = os.path.join(folder_path, 'noisy_employees')  # Name of the output data set
+input_format = 'excel'    # Format of the input tables: 'excel', 'parquet', 'feather' or 'csv'
+output_format = 'excel'   # Format of the output tables: 'excel', 'parquet', 'feather' or 'csv'
+# All random streams of the script are derived from this seed, which produces a controlled and consistent output
 seed = 7
-random.seed(10)
-np.random.seed(seed=5)
 
 nan_percentage = 0.02           # The percentage of missing values to be inserted into our data set
 typographic_percentage = 0.05   # The percentage of typographic errors to be inserted into our data set
 confusion_percentage = 0.02     # The percentage of typographic errors due to confusion
 drop_percentage = 0.02          # The percentage of a record to be completely forgotten
+locale = default_locale         # The Faker locale of the names that employee names are confused with
+noise_manifest = True   # Also write the manifest of every cell the noise changed and every record it dropped
+streaming = False   # Insert the noise chunk by chunk, so the memory needed does not grow with the size of the tables
+chunk_size = 100000   # Number of records that are read, made noisy and written at a time in streaming mode
 
 
 # The different departments of the company and the corresponding job titles
@@ -43,203 +47,294 @@ departments = {
                      'Database Administrator', 'Network Engineer', 'Software Engineering Manager']
 }
 
-# This function generates a random string of length = length
-def get_random_string(length):
-    letters = string.ascii_lowercase
-    result_str = ''.join(random.choice(letters) for i in range(length))
-    return result_str
-
-
-# This function randomly inserts wrong characters and digits in a Data Frame to model typographic errors
-def typographic_error(df, chars, digits, probability):
-    for row in df.index:
-        for column in chars:    # This loop inserts wrong characters in existing string columns
-            error_chance = np.random.uniform(0, 1)
-            if error_chance < probability:  # This simulates the random change for a typographic error to occur
-                wrong_letter = int(np.random.uniform(0, len(df.at[row, column])))  # The string character to be replaced
-                wrong_character = get_random_string(1)      # The random character that will replace the old character
-                string_list = list(df.at[row, column])
-                string_list[wrong_letter] = wrong_character
-                df.at[row, column] = "".join(string_list)    # Update the old string with the new, wrong one
-
-        for column in digits:    # This loop inserts wrong digits in existing numeric columns
-            error_chance = np.random.uniform(0, 1)
-            if error_chance < probability:  # This simulates the random change for a typographic error to occur
-                wrong_digit = int(np.random.uniform(0, len(str(df.at[row, column]))))  # The digit that will be replaced
-                wrong_number = str(int(np.random.uniform(0, 9)))
-                string_list = list(str(df.at[row, column]))
-                string_list[wrong_digit] = wrong_number
-                df.at[row, column] = int("".join(string_list))  # Update the old number with a wrong digit
+# This function turns an array of uniform values into random lowercase characters, one for every error
+def get_random_characters(uniforms):
+    letters = np.array(list(string.ascii_lowercase))
+    return letters[(uniforms*len(letters)).astype(int)]
+
+
+# The noise functions draw every random value from a field of the random streams of the table, with the counter of
+# every record, so the noise of a record does not depend on the other records of the table. When a manifest list is
+# given, they also add the cells they changed to it, straight from the masks they apply
+
+
+# This function adds the cells that a noise function changed in a column to the manifest, with their rows in the table,
+# their original values and their noisy values as text. Cells that the noise did not change, e.g. a name confused with
+# the same name or a missing value inserted into a missing cell, are left out. Without original values the whole
+# records of the rows were changed, e.g. dropped
+def record_noise(manifest, noise, column, rows, original=None, noisy=None):
+    if manifest is None:
+        return
+    if original is None:
+        manifest.append(pd.DataFrame({'Row': rows, 'Column': column, 'Noise': noise, 'Original': None, 'Noisy': None}))
+        return
+    original = pd.Series(original)
+    missing = original.isna().values
+    original = np.where(missing, None, original.astype(str).values)
+    if noisy is None:   # Missing values have no noisy value
+        changed = ~missing
+    else:
+        noisy = pd.Series(noisy).astype(str).values
+        changed = missing | (original != noisy)
+        noisy = noisy[changed]
+    manifest.append(pd.DataFrame({'Row': rows[changed], 'Column': column, 'Noise': noise,
+                                  'Original': original[changed], 'Noisy': noisy}))
+
+
+# This function randomly inserts wrong characters and digits in a Data Frame to model typographic errors. The cells with
+# an error are drawn for a whole column at once and only those cells are then changed
+def typographic_error(df, chars, digits, probability, streams, counters, manifest=None):
+    for column in chars:    # This loop inserts wrong characters in existing string columns
+        error = (streams.uniform(('Typographic Error', column), counters) < probability) & df[column].notna().values
+        old_strings = df[column].values[error].astype(str)
+        lengths = np.array([len(old_string) for old_string in old_strings], dtype=int)
+        # The characters to be replaced and the characters that replace them
+        wrong_letters = (streams.uniform(('Wrong Position', column), counters[error])*lengths).astype(int)
+        wrong_characters = get_random_characters(streams.uniform(('Wrong Character', column), counters[error]))
+        new_strings = [old_string[:wrong_letter] + wrong_character + old_string[wrong_letter + 1:]
+                       for old_string, wrong_letter, wrong_character
+                       in zip(old_strings, wrong_letters, wrong_characters)]
+        record_noise(manifest, 'Typographic Error', column, np.flatnonzero(error), old_strings, new_strings)
+        df.loc[error, column] = new_strings
+
+    for column in digits:    # This loop inserts wrong digits in existing numeric columns
+        error = (streams.uniform(('Typographic Error', column), counters) < probability) & df[column].notna().values
+        old_numbers = [str(number) for number in df[column].values[error]]
+        lengths = np.array([len(old_number) for old_number in old_numbers], dtype=int)
+        # The digits that will be replaced and the digits that replace them
+        wrong_digits = (streams.uniform(('Wrong Position', column), counters[error])*lengths).astype(int)
+        wrong_numbers = streams.uniform(('Wrong Character', column), counters[error], 0, 9).astype(int).astype(str)
+        new_numbers = [int(old_number[:wrong_digit] + wrong_number + old_number[wrong_digit + 1:])
+                       for old_number, wrong_digit, wrong_number in zip(old_numbers, wrong_digits, wrong_numbers)]
+        record_noise(manifest, 'Typographic Error', column, np.flatnonzero(error), old_numbers, new_numbers)
+        # The new numbers keep the dtype of the column, whose width leaves room for the changed digit
+        df.loc[error, column] = np.asarray(new_numbers, dtype=df[column].dtype)
 
     return df
 
 
-def nan_insertion(df, probability):  # This function inserts nan values in a Data Frame to model missing values
-    for row in df.index:
-        for column in df.columns:
-            error_chance = np.random.uniform(0, 1)
-            if error_chance < probability:  # This simulates the random change for a missing value to occur
-                df[column].iloc[row] = np.nan
+# This function inserts nan values in a Data Frame to model missing values. The missing cells of every column are
+# drawn at once and replaced with a single masked assignment. Integer and boolean columns become their nullable variant
+# with the missing cells as mask, instead of floats that the schema turns back into integers
+def nan_insertion(df, probability, streams, counters, manifest=None):
+    for column in df.columns:
+        missing = streams.uniform(('Missing Value', column), counters) < probability
+        if missing.any():
+            values = df[column]
+            record_noise(manifest, 'Missing Value', column, np.flatnonzero(missing), values[missing])
+            if str(values.dtype) in nullable_dtypes:
+                masked_array = pd.arrays.BooleanArray if values.dtype == bool else pd.arrays.IntegerArray
+                df[column] = pd.Series(masked_array(values.values, missing), index=df.index)
+                continue
+            if isinstance(values.dtype, pd.StringDtype):   # Masking a slice of arrow strings corrupts it in pandas 1.5
+                values = values.astype(object)
+            df[column] = values.mask(missing)
     return df
 
 
-def drop_random_records(df, probability):
-    for i in range(len(df)):
-        error_chance = np.random.uniform(0, 1)
-        if error_chance < probability:  # This simulates the chance of a record to be completely forgotten
-            df = df.drop(labels=i)
+# This function drops random records of a Data Frame with a single boolean filter, to model forgotten records
+def drop_random_records(df, probability, streams, counters, manifest=None):
+    dropped = streams.uniform('Dropped Record', counters) < probability
+    record_noise(manifest, 'Dropped Record', None, np.flatnonzero(dropped))
+    return df[~dropped]
+
+
+# This function models the confusion of an employee name with a random other first or last name. The new names are
+# drawn from the same name pools as the names of the generated employees
+def name_confusion(df, probability, streams, counters, locale=locale, manifest=None):
+    error_chance = streams.uniform('Name Confusion', counters)
+    first_name = error_chance < probability
+    last_name = error_chance > 1 - probability
+    first_names = streams.uniform(('Confused Name', 'First Name'), counters[first_name])
+    last_names = streams.uniform(('Confused Name', 'Last Name'), counters[last_name])
+    first_names = draw_names(first_names, 'First Name', locale)
+    last_names = draw_names(last_names, 'Last Name', locale)
+    record_noise(manifest, 'Name Confusion', 'First Name', np.flatnonzero(first_name),
+                 df['First Name'].values[first_name], first_names)
+    record_noise(manifest, 'Name Confusion', 'Last Name', np.flatnonzero(last_name),
+                 df['Last Name'].values[last_name], last_names)
+    df.loc[first_name, 'First Name'] = first_names
+    df.loc[last_name, 'Last Name'] = last_names
     return df
 
-# -------------------------------- Personal Profile errors ------------------------------------------------------------
-
-
-employees_df = pd.read_excel(input_path, sheet_name='Professional_Profile', engine='openpyxl')
-noisy_employees = typographic_error(employees_df.copy(), ['First Name', 'Last Name', 'Job Title'],
-                                    ['Time Left', 'Children', 'Number of prev. Employers',
-                                     'Salary'], typographic_percentage)
-noisy_employees = nan_insertion(noisy_employees.copy(), nan_percentage)
-
-for i in noisy_employees.index:  # Confusion in employee name
-    error_chance = np.random.uniform(0, 1)
-    if error_chance < confusion_percentage:  # This simulates the random change for a confusion to occur
-        noisy_employees.at[i, 'First Name'] = fake.first_name()
-    elif error_chance > 1 - confusion_percentage:
-        noisy_employees.at[i, 'Last Name'] = fake.last_name()
-
-for i in noisy_employees.index:  # Confusion in marital status and Department
-    error_chance = np.random.uniform(0, 1)
-    if error_chance < confusion_percentage:  # This simulates the random change for a confusion to occur
-        if noisy_employees.at[i, 'Marital Status'] == 'Married':
-            noisy_employees.at[i, 'Marital Status'] = 'Single'
-        else:
-            noisy_employees.at[i, 'Marital Status'] = 'Married'
-    elif error_chance > 1 - confusion_percentage:  # The department is wrong!
-        random_department = int(
-            np.random.uniform(0, len(list(departments.keys()))))  # Random index to estimate department
-        noisy_employees.at[i, 'Department'] = list(departments.keys())[random_department]
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='w') as writer:
-    noisy_employees.to_excel(writer,  index=False, sheet_name='Professional_Profile')
-writer.save()
-writer.close()
-
-# -------------------------------- Personal Profile errors end ---------------------------------------------------------
-
-# --------------------------------------------------HR errors  ---------------------------------------------------------
-hr_df = pd.read_excel(input_path, sheet_name='HR', engine='openpyxl')
-
-noisy_hr = typographic_error(hr_df.copy(), ['Performance'], ['Year', 'Loyalty', 'Number of Promotions', 'Bonus',
-                                                             'Overtime', 'Chargeability', 'Employees Fired'],
-                                                             typographic_percentage)
-noisy_hr = nan_insertion(noisy_hr.copy(), nan_percentage)
-noisy_hr = drop_random_records(noisy_hr, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_hr.to_excel(writer,  index=False, sheet_name='HR')
-writer.save()
-writer.close()
-# --------------------------------------------------HR end  ------------------------------------------------------------
-
-# --------------------------------------------------Sales errors  ------------------------------------------------------
-sales_df = pd.read_excel(input_path, sheet_name='Sales', engine='openpyxl')
-
-noisy_sales = typographic_error(sales_df.copy(), ['Performance'], ['Year', 'Loyalty', 'Number of Promotions', 'Bonus',
-                                                                   'Overtime', 'Chargeability', 'Total Sales',
-                                                                   'Clients Asking'], typographic_percentage)
-noisy_sales = nan_insertion(noisy_sales.copy(), nan_percentage)
-noisy_sales = drop_random_records(noisy_sales, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_sales.to_excel(writer,  index=False, sheet_name='Sales')
-writer.save()
-writer.close()
-# --------------------------------------------------Sales end  ---------------------------------------------------------
-
-# --------------------------------------------------Product errors  ----------------------------------------------------
-product_df = pd.read_excel(input_path, sheet_name='Product', engine='openpyxl')
-
-noisy_product = typographic_error(product_df.copy(), ['Performance'], ['Year', 'Loyalty', 'Number of Promotions', 'Bonus',
-                                                                   'Overtime', 'Chargeability', 'Total Defects',
-                                                                   'Number of Complaining Customers'], typographic_percentage)
-noisy_product = nan_insertion(noisy_product.copy(), nan_percentage)
-noisy_product = drop_random_records(noisy_product, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_product.to_excel(writer,  index=False, sheet_name='Product')
-writer.save()
-writer.close()
-# --------------------------------------------------Product end  -------------------------------------------------------
-
-# --------------------------------------------------Finance errors  ----------------------------------------------------
-finance_df = pd.read_excel(input_path, sheet_name='Finance', engine='openpyxl')
-
-noisy_finance = typographic_error(finance_df.copy(), ['Performance'], ['Year', 'Loyalty', 'Number of Promotions', 'Bonus',
-                                                                   'Overtime', 'Chargeability',
-                                                                   'Non - Servicing Obligactions'], typographic_percentage)
-noisy_finance = nan_insertion(noisy_finance.copy(), nan_percentage)
-noisy_finance = drop_random_records(noisy_finance, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_finance.to_excel(writer,  index=False, sheet_name='Finance')
-writer.save()
-writer.close()
-# --------------------------------------------------Finance end  -------------------------------------------------------
-
-# --------------------------------------------------Legal errors  ------------------------------------------------------
-legal_df = pd.read_excel(input_path, sheet_name='Legal', engine='openpyxl')
-
-noisy_legal = typographic_error(legal_df.copy(), ['Performance'], ['Year', 'Loyalty', 'Number of Promotions', 'Bonus',
-                                                                   'Overtime', 'Chargeability', 'Successful Lawsuits',
-                                                                   'Disputes amicably resolved'], typographic_percentage)
-noisy_legal = nan_insertion(noisy_legal.copy(), nan_percentage)
-noisy_legal = drop_random_records(noisy_legal, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_legal.to_excel(writer,  index=False, sheet_name='Legal')
-writer.save()
-writer.close()
-# --------------------------------------------------Legal end  ---------------------------------------------------------
-
-# --------------------------------------------------Strategy errors  ---------------------------------------------------
-strategy_df = pd.read_excel(input_path, sheet_name='Strategy', engine='openpyxl')
-
-noisy_strategy = typographic_error(strategy_df.copy(), ['Performance'], ['Year', 'Loyalty', 'Number of Promotions', 'Bonus',
-                                                                   'Overtime', 'Chargeability', 'Total Sales',
-                                                                   'Number of Teams', 'Number of Projects'], typographic_percentage)
-noisy_strategy = nan_insertion(noisy_strategy.copy(), nan_percentage)
-noisy_strategy = drop_random_records(noisy_strategy, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_strategy.to_excel(writer,  index=False, sheet_name='Strategy')
-writer.save()
-writer.close()
-# --------------------------------------------------Strategy end  ------------------------------------------------------
-
-# --------------------------------------------------Technology errors  -------------------------------------------------
-technology_df = pd.read_excel(input_path, sheet_name='Technology', engine='openpyxl')
-
-noisy_technology = typographic_error(technology_df.copy(), ['Performance'], ['Year', 'Loyalty', 'Number of Promotions', 'Bonus',
-                                                                   'Overtime', 'Chargeability',
-                                                                   'Problematic Code Commits'],  typographic_percentage)
-noisy_technology = nan_insertion(noisy_technology.copy(), nan_percentage)
-noisy_technology = drop_random_records(noisy_technology, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_technology.to_excel(writer,  index=False, sheet_name='Technology')
-writer.save()
-writer.close()
-# --------------------------------------------------Technology end  ----------------------------------------------------
-
-# --------------------------------------------------Psychometric errors  -----------------------------------------------
-psychometric_df = pd.read_excel(input_path, sheet_name='Psychometric_Indicators', engine='openpyxl')
-
-
-noisy_psychometric = nan_insertion(psychometric_df.copy(), nan_percentage)
-noisy_psychometric = drop_random_records(noisy_psychometric, drop_percentage)
-
-with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
-    noisy_psychometric.to_excel(writer,  index=False, sheet_name='Psychometric_Indicators')
-writer.save()
-writer.close()
-# --------------------------------------------------Technology end  ----------------------------------------------------
 
+# This function models the confusion of the marital status, which is swapped, and of the department, which is replaced
+# by a random department
+def marital_department_confusion(df, probability, streams, counters, manifest=None):
+    error_chance = streams.uniform('Marital Department Confusion', counters)
+    marital = error_chance < probability
+    department = error_chance > 1 - probability
+    old_statuses = df['Marital Status'].values[marital]
+    new_statuses = np.where(old_statuses == 'Married', 'Single', 'Married')
+    department_names = np.array(list(departments.keys()))
+    new_departments = department_names[streams.uniform('Confused Department', counters[department], 0,
+                                                       len(department_names)).astype(int)]
+    record_noise(manifest, 'Marital Status Confusion', 'Marital Status', np.flatnonzero(marital), old_statuses,
+                 new_statuses)
+    record_noise(manifest, 'Department Confusion', 'Department', np.flatnonzero(department),
+                 df['Department'].values[department], new_departments)
+    df.loc[marital, 'Marital Status'] = new_statuses
+    df.loc[department, 'Department'] = new_departments
+    return df
+
+
+# The noise that is inserted into every table of the data set. 'Characters' and 'Digits' are the string and numeric
+# columns that get typographic errors, 'Confusion' adds name, marital status and department confusion and 'Drop'
+# forgets random records. Missing values are inserted into every table
+evaluation_digits = ['Year', 'Loyalty', 'Number of Promotions', 'Bonus', 'Overtime', 'Chargeability']
+noise_specs = {
+    'Professional_Profile': {'Characters': ['First Name', 'Last Name', 'Job Title'],
+                             'Digits': ['Time Left', 'Children', 'Number of prev. Employers', 'Salary'],
+                             'Confusion': True, 'Drop': False},
+    'HR': {'Characters': ['Performance'], 'Digits': evaluation_digits + ['Employees Fired'],
+           'Confusion': False, 'Drop': True},
+    'Sales': {'Characters': ['Performance'], 'Digits': evaluation_digits + ['Total Sales', 'Clients Asking'],
+              'Confusion': False, 'Drop': True},
+    'Product': {'Characters': ['Performance'],
+                'Digits': evaluation_digits + ['Total Defects', 'Number of Complaining Customers'],
+                'Confusion': False, 'Drop': True},
+    'Finance': {'Characters': ['Performance'], 'Digits': evaluation_digits + ['Non - Servicing Obligactions'],
+                'Confusion': False, 'Drop': True},
+    'Legal': {'Characters': ['Performance'],
+              'Digits': evaluation_digits + ['Successful Lawsuits', 'Disputes amicably resolved'],
+              'Confusion': False, 'Drop': True},
+    'Strategy': {'Characters': ['Performance'],
+                 'Digits': evaluation_digits + ['Total Sales', 'Number of Teams', 'Number of Projects'],
+                 'Confusion': False, 'Drop': True},
+    'Technology': {'Characters': ['Performance'], 'Digits': evaluation_digits + ['Problematic Code Commits'],
+                   'Confusion': False, 'Drop': True},
+    'Psychometric_Indicators': {'Characters': [], 'Digits': [], 'Confusion': False, 'Drop': True}
+}
+
+
+# The columns that are changed by the confusion errors
+confusion_columns = ['First Name', 'Last Name', 'Marital Status', 'Department']
+
+
+# This function returns the counters of the records of a table for the random streams of the noise. A record is
+# identified by the ID of its employee and, in the evaluation tables, by its year
+def record_counters(df):
+    if 'Year' in df.columns:
+        return entity_counters(df['ID'], df['Year'].values)
+    return entity_counters(df['ID'])
+
+
+# This function inserts all the noise of a spec into a copy of a table. The categorical columns that get new values are
+# turned into plain columns first, which already copies the table, so the noise functions change that copy in place.
+# Cached streams of the table already hold the counters of its records. The changes of all noise functions are added to
+# the manifest list, when one is given, in the order they are applied, so a cell can be listed more than once
+def inject_noise(df, spec, streams, nan_percentage=nan_percentage, typographic_percentage=typographic_percentage,
+                 confusion_percentage=confusion_percentage, drop_percentage=drop_percentage, locale=locale,
+                 manifest=None):
+    counters = streams.counters if isinstance(streams, CachedStreams) else record_counters(df)
+    noisy_df = plain_columns(df, spec['Characters'] + (confusion_columns if spec['Confusion'] else []))
+    with span('typographic errors', len(df)):
+        noisy_df = typographic_error(noisy_df, spec['Characters'], spec['Digits'], typographic_percentage,
+                                     streams, counters, manifest)
+    with span('missing values', len(df)):
+        noisy_df = nan_insertion(noisy_df, nan_percentage, streams, counters, manifest)
+    if spec['Confusion']:
+        with span('name confusion', len(df)):
+            noisy_df = name_confusion(noisy_df, confusion_percentage, streams, counters, locale,   # Employee name
+                                      manifest)
+        with span('marital status and department confusion', len(df)):
+            noisy_df = marital_department_confusion(noisy_df, confusion_percentage, streams, counters, manifest)
+    if spec['Drop']:
+        with span('dropped records', len(df)):
+            noisy_df = drop_random_records(noisy_df, drop_percentage, streams, counters, manifest)
+    return noisy_df
+
+
+# This function turns the changes that the noise made to a table into rows of the noise manifest. Every change gets
+# the ID, and in the evaluation tables the year, of its record in the clean table, so a cleaned table is scored with a
+# join on them. Row is the position of the record in the clean table, with first_row for a chunk of the table
+def manifest_rows(df, table, changes, first_row=0):
+    if not changes:
+        return pd.DataFrame({column: [] for column in manifest_schema.keys()})
+    changes = pd.concat(changes, ignore_index=True)
+    rows = changes['Row'].values
+    manifest_df = pd.DataFrame({'Table': table, 'Row': rows + first_row, 'ID': df['ID'].values[rows],
+                                'Year': df['Year'].values[rows] if 'Year' in df.columns else None})
+    for column in ['Column', 'Noise', 'Original', 'Noisy']:
+        manifest_df[column] = changes[column].values
+    return manifest_df
+
+
+# This function inserts noise into all tables of a data set, given as a dictionary of data frames. Every table gets its
+# own random streams derived from the seed, so the noise of a table does not depend on the other tables. The schema of
+# every table is enforced again on its noisy version, with nullable columns where missing values were inserted. The
+# streams of the tables can also be given, e.g. cached streams that are shared by several noisy versions of the tables.
+# With manifest the noise manifest of all tables is added to the noisy data set as the 'Noise_Manifest' table
+def noisy_data_set(tables, seed=seed, nan_percentage=nan_percentage, typographic_percentage=typographic_percentage,
+                   confusion_percentage=confusion_percentage, drop_percentage=drop_percentage, locale=locale,
+                   table_streams=None, manifest=False):
+    noisy_tables = {}
+    manifest_dfs = []
+    for table, spec in noise_specs.items():
+        if table not in tables:
+            continue
+        streams = RandomStreams(seed, 'noise', table) if table_streams is None else table_streams[table]
+        changes = [] if manifest else None
+        with span(table, len(tables[table])):
+            noisy_tables[table] = apply_schema(inject_noise(tables[table], spec, streams, nan_percentage,
+                                                            typographic_percentage, confusion_percentage,
+                                                            drop_percentage, locale, changes), table)
+            if manifest:
+                manifest_dfs.append(manifest_rows(tables[table], table, changes))
+    if manifest:
+        noisy_tables['Noise_Manifest'] = apply_schema(pd.concat(manifest_dfs, ignore_index=True), 'Noise_Manifest')
+    return noisy_tables
+
+
+# The cached streams of every table of a data set for a seed, which hold the counters of the records of the table
+def cached_streams(tables, seed=seed):
+    return {table: CachedStreams(seed, record_counters(df), 'noise', table) for table, df in tables.items()
+            if table in noise_specs}
+
+
+# In streaming mode every table is read, made noisy and written chunk by chunk, so the memory needed is bounded by
+# chunk_size instead of the size of the tables. The noise of a record only depends on the seed and the record, so the
+# noisy tables are the same as the ones of noisy_data_set. The next chunk is read by a thread while a chunk is made
+# noisy and written. Tables that do not exist in the input data set are skipped. With manifest the noise manifest is
+# written chunk by chunk too
+def stream_noisy_data_set(input_path, input_format, output_path, output_format, seed=seed,
+                          nan_percentage=nan_percentage, typographic_percentage=typographic_percentage,
+                          confusion_percentage=confusion_percentage, drop_percentage=drop_percentage, locale=locale,
+                          chunk_size=chunk_size, manifest=False):
+    manifest_writer = TableWriter(output_path, 'Noise_Manifest', output_format) if manifest else None
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        for table, spec in noise_specs.items():
+            if not os.path.exists(table_path(input_path, table, input_format)):
+                continue
+            streams = RandomStreams(seed, 'noise', table)
+            chunks = read_chunks(input_path, table, input_format, chunk_size)
+            writer = TableWriter(output_path, table, output_format)
+            next_chunk = reader.submit(next, chunks, None)
+            first_row = 0
+            with span(table):
+                while True:
+                    df = next_chunk.result()
+                    if df is None:
+                        break
+                    next_chunk = reader.submit(next, chunks, None)
+                    changes = [] if manifest else None
+                    with span('noise', len(df)):
+                        noisy_df = apply_schema(inject_noise(df, spec, streams, nan_percentage, typographic_percentage,
+                                                             confusion_percentage, drop_percentage, locale, changes),
+                                                table)
+                    writer.write(noisy_df)
+                    if changes:
+                        manifest_writer.write(apply_schema(manifest_rows(df, table, changes, first_row),
+                                                           'Noise_Manifest'))
+                    first_row += len(df)
+            writer.close()
+    if manifest:
+        manifest_writer.close()
+
+
+if __name__ == '__main__':
+    if streaming:
+        stream_noisy_data_set(input_path, input_format, output_path, output_format, manifest=noise_manifest)
+    else:
+        tables = {table: read_table(input_path, table, input_format) for table in noise_specs.keys()}
+        write_tables(noisy_data_set(tables, manifest=noise_manifest), output_path, output_format, mode='w')
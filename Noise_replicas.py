@@ -0,0 +1,130 @@
+import argparse
+import itertools
+import json
+import numpy as np
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
+import Noise_insertion
+from Storage import read_table, write_tables, storage_formats
+from Instrumentation import span
+
+folder_path = sys.path[0]
+input_path = os.path.join(folder_path, 'employees')  # Name of the clean input data set
+input_format = 'excel'    # Format of the input tables: 'excel', 'parquet', 'feather' or 'csv'
+output_folder = os.path.join(folder_path, 'noisy_replicas')  # Folder where every replica is saved as a data set
+output_format = 'excel'   # Format of the output tables: 'excel', 'parquet', 'feather' or 'csv'
+number_workers = 1   # Number of processes that make the replicas in parallel. 1 makes them one by one
+noise_manifest = Noise_insertion.noise_manifest   # Also write the manifest of the noise of every replica
+
+# Every combination of the seeds and noise percentages below is a noisy replica of the clean data set
+seeds = [Noise_insertion.seed]
+nan_percentages = [Noise_insertion.nan_percentage]
+typographic_percentages = [Noise_insertion.typographic_percentage]
+confusion_percentages = [Noise_insertion.confusion_percentage]
+drop_percentages = [Noise_insertion.drop_percentage]
+
+# The clean tables, which are read once and given once to every process that makes replicas
+tables = None
+
+
+# This function returns the noise configurations of all combinations of the given seeds and percentages
+def replica_grid(seeds=seeds, nan_percentages=nan_percentages, typographic_percentages=typographic_percentages,
+                 confusion_percentages=confusion_percentages, drop_percentages=drop_percentages):
+    return [{'seed': seed, 'nan_percentage': nan, 'typographic_percentage': typographic,
+             'confusion_percentage': confusion, 'drop_percentage': drop}
+            for seed, nan, typographic, confusion, drop in itertools.product(
+                seeds, nan_percentages, typographic_percentages, confusion_percentages, drop_percentages)]
+
+
+# The name of the data set of a replica, made of its noise configuration
+def replica_name(replica):
+    return 'seed%d_nan%g_typo%g_conf%g_drop%g' % (replica['seed'], replica['nan_percentage'],
+                                                  replica['typographic_percentage'], replica['confusion_percentage'],
+                                                  replica['drop_percentage'])
+
+
+def set_tables(clean_tables):
+    global tables
+    tables = clean_tables
+
+
+# This function makes and writes replicas with the same seed. The counters of the records and the random values drawn
+# for all records of a table are the same for all of them, so they are drawn once and only compared with the different
+# percentages of every replica. A record with noise at a percentage therefore also has it at any higher percentage
+def make_replicas(replicas, output_folder, output_format, locale=Noise_insertion.locale, manifest=noise_manifest):
+    table_streams = Noise_insertion.cached_streams(tables, replicas[0]['seed'])
+    for replica in replicas:
+        with span(replica_name(replica)):
+            noisy_tables = Noise_insertion.noisy_data_set(tables, replica['seed'], replica['nan_percentage'],
+                                                          replica['typographic_percentage'],
+                                                          replica['confusion_percentage'], replica['drop_percentage'],
+                                                          locale, table_streams, manifest)
+            write_tables(noisy_tables, os.path.join(output_folder, replica_name(replica)), output_format, mode='w')
+
+
+# This function makes all noisy replicas of the clean tables and writes every one of them as a data set inside
+# output_folder, together with 'replicas.json', which lists the data set and noise configuration of every replica.
+# The replicas with the same seed are split among the processes as evenly as possible and every process gets the
+# clean tables only once
+def noisy_replicas(clean_tables, replicas, output_folder=output_folder, output_format=output_format,
+                   number_workers=1, locale=Noise_insertion.locale, manifest=noise_manifest):
+    seed_replicas = {}
+    for replica in replicas:
+        seed_replicas.setdefault(replica['seed'], []).append(replica)
+    tasks = []
+    for same_seed in seed_replicas.values():
+        limits = np.linspace(0, len(same_seed), min(max(1, number_workers // len(seed_replicas)), len(same_seed)) + 1)
+        tasks.extend(same_seed[first:last] for first, last in zip(limits[:-1].astype(int), limits[1:].astype(int)))
+
+    if number_workers > 1:
+        with ProcessPoolExecutor(max_workers=number_workers, initializer=set_tables,
+                                 initargs=(clean_tables,)) as executor:
+            list(executor.map(make_replicas, tasks, [output_folder]*len(tasks), [output_format]*len(tasks),
+                              [locale]*len(tasks), [manifest]*len(tasks)))
+    else:
+        set_tables(clean_tables)
+        for task in tasks:
+            make_replicas(task, output_folder, output_format, locale, manifest)
+
+    os.makedirs(output_folder, exist_ok=True)
+    with open(os.path.join(output_folder, 'replicas.json'), 'w') as replicas_file:
+        json.dump([dict(replica, data_set=replica_name(replica)) for replica in replicas], replicas_file, indent=2)
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description='Make many noisy replicas of a clean data set in one run, one for '
+                                                 'every combination of the given seeds and noise percentages. The '
+                                                 'clean data set is read only once.')
+    parser.add_argument('--path', default=input_path, help='clean data set (default: %(default)s)')
+    parser.add_argument('--format', default=input_format, choices=list(storage_formats.keys()),
+                        help='format of the clean data set (default: %(default)s)')
+    parser.add_argument('--output-folder', default=output_folder, help='folder of the replicas (default: %(default)s)')
+    parser.add_argument('--output-format', default=output_format, choices=list(storage_formats.keys()),
+                        help='format of the replicas (default: %(default)s)')
+    parser.add_argument('--seeds', type=int, nargs='+', default=seeds, help='seeds of the noise insertion')
+    parser.add_argument('--nan-percentages', type=float, nargs='+', default=nan_percentages,
+                        help='percentages of missing values')
+    parser.add_argument('--typographic-percentages', type=float, nargs='+', default=typographic_percentages,
+                        help='percentages of typographic errors')
+    parser.add_argument('--confusion-percentages', type=float, nargs='+', default=confusion_percentages,
+                        help='percentages of confusion errors')
+    parser.add_argument('--drop-percentages', type=float, nargs='+', default=drop_percentages,
+                        help='percentages of forgotten records')
+    parser.add_argument('--number-workers', type=int, default=number_workers,
+                        help='number of processes that make the replicas')
+    parser.add_argument('--locale', default=Noise_insertion.locale,
+                        help='Faker locale of the names that employee names are confused with')
+    parser.add_argument('--no-noise-manifest', dest='noise_manifest', action='store_false', default=noise_manifest,
+                        help='do not write the manifest of the noise of every replica')
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    clean_tables = {table: read_table(args.path, table, args.format) for table in Noise_insertion.noise_specs.keys()}
+    replicas = replica_grid(args.seeds, args.nan_percentages, args.typographic_percentages,
+                            args.confusion_percentages, args.drop_percentages)
+    noisy_replicas(clean_tables, replicas, args.output_folder, args.output_format, args.number_workers, args.locale,
+                   args.noise_manifest)
+    print('%d noisy replicas saved to %s' % (len(replicas), args.output_folder))
@@ -1,22 +1,20 @@
 import numpy as np
 import pandas as pd
-from faker import Faker
-import random
-import datetime
-import uuid
-import radar
 import sys
-from openpyxl import load_workbook
+import os
+from concurrent.futures import ProcessPoolExecutor
+from Storage import write_tables, TableWriter
+from Name_pools import default_locale, draw_names, draw_name_categories
+from Schema import apply_schema, schema_frame, id_column
+from Instrumentation import span
+from Random_streams import RandomStreams
 
 folder_path = sys.path[0]
-output_path = folder_path + '\\employees.xlsx'   # This is the file name where the output will be saved
+output_path = os.path.join(folder_path, 'employees')   # This is the data set where the output will be saved
+output_format = 'excel'   # Format of the output tables: 'excel', 'parquet', 'feather' or 'csv'
 
-# There is a number of different seed functions that should be specified to produce a controlled and consistent output
-fake = Faker()
-Faker.seed(1)
+# All random streams of the script are derived from this seed, which produces a controlled and consistent output
 seed = 7
-random.seed(10)
-np.random.seed(seed=5)
 # ------------------------------------------ PROBLEM PARAMETERS -------------------------------------------------------#
 
 # The employees are split in 5 classes based on their age. The probability of each class to occur is imbalanced
@@ -33,6 +31,11 @@ basic_income = 10000   # The basic income equals the lowest possible salary an e
 e = 0.1  # Maximum percentage of annual salary raise
 
 number_employees = 1000   # The total number of employees working in our company
+reference_year = 2020   # The current year of the data set, up to which the ages and the times in the company count
+locale = default_locale   # The Faker locale of the employee names
+number_shards = 1   # Number of processes that generate the employees in parallel. 1 generates them in this process
+block_size = 10000   # Employees are generated in blocks of this size, each one with its own random streams
+streaming = False   # Write the employees block by block, so the memory needed does not grow with number_employees
 
 # The different departments of the company and the corresponding job titles
 departments = {
@@ -52,183 +55,416 @@ departments = {
       'Technology': ['Information Security Manager', 'IT Support', 'IT Director', 'Software Engineer',
                      'Database Administrator', 'Network Engineer', 'Software Engineering Manager']
 }
-# ---------------------------------------- PROBLEM PARAMETERS END -----------------------------------------------------#
-
-all_employees = []   # An empty list to store all employee data in order to store them in a pandas dataframe later
-all_psychometrics = []   # An empty list to store all psychometric data to store them in a pandas dataframe later
-
-# Through the following for loop, we will create personal, professional and psychometric data for all employees
-for i in range(number_employees):
-    employee = {}       # Dictionary to store all personal data for the specific employee. Will be appended to the list
-    psychometrics = {}  # Dictionary to store all psychometrics for the specific employee. Will be appended to the list
-
-    rnd = random.Random()  # We have to control the seed in every iteration to return consistent UUIDs
-    rnd.seed(i)
-    employee_id = str(uuid.UUID(int=rnd.getrandbits(128), version=4))   # Employee ID
-    employee['ID'] = employee_id
-    psychometrics['ID'] = employee_id
-    employee['First Name'] = fake.first_name()   # First Name
-    employee['Last Name'] = fake.last_name()     # Last Name
-
-    gender = random.random()                     # Gender
-    if gender < 0.5:
-        employee['Gender'] = 'M'
-    else:
-        employee['Gender'] = 'F'
 
-    marital = random.random()                     # Marital Status
-    if marital < 0.5:
-        employee['Marital Status'] = 'Married'
-    else:
-        employee['Marital Status'] = 'Single'
-
-    age_interval = np.random.choice(list(employee_age_range.keys()), p=employee_age_dist) # Generate random age interval
-    age = int(np.random.uniform(employee_age_range[str(age_interval)][0],
-                                employee_age_range[str(age_interval)][1]))  # Generate exact age
-
-    old_or_new = np.random.uniform(0, 1)  # Randomly decide if employee still works for the company or not
-    if old_or_new < 0.8:   # This means the employee has left the company. 80% of our records refer to old employees
-        works_here = False
-        time_left = int(np.random.uniform(0, 20))   # Random time interval that the employee has left the company
-        age_real = age + time_left    # Adjust age for the old employees
-        employee['Time Left'] = time_left
-    else:
-        age_real = age
-        works_here = True
-        employee['Time Left'] = 0
-
-    employee['Works Here'] = works_here     # Define if the employee still works for the company
-    birth_year = 2020 - age_real
-    birthday = radar.random_datetime(start=datetime.date(year=birth_year, month=1, day=1),
-                                     stop=datetime.date(year=birth_year, month=12, day=31)).strftime("%Y-%m-%d")
-    employee['Birthday'] = birthday         # Employee's birthday
-
-    number_children = round(max(0, np.random.normal(1.5*min(1, age_real/35), 0.5)))
-    employee['Children'] = number_children
-
-    # In order to calculate academic background, we need to distinguish the age interval [24,29] from the rest
-    if ((age_interval == '2') & (age < 27)):
-        random_background = np.random.choice(list(academic_background.keys()),
-                                             p=academic_background_dist[age_interval][0])
-    elif ((age_interval == '2') & (age >= 27)):
-        random_background = np.random.choice(list(academic_background.keys()),
-                                             p=academic_background_dist[age_interval][1])
-    else:
-        random_background = np.random.choice(list(academic_background.keys()),
-                                             p=academic_background_dist[age_interval])
+# The BIG 5 personality factors and the 2 facets that each one of them lies in-between
+big_five = {'Concientiousness': ['Orderliness', 'Industriousness'], 'Neuroticism': ['Withdrawal', 'Volatility'],
+            'Extraversion': ['Enthusiasm', 'Assertiveness'], 'Openness to Experience': ['Intellect', 'Openness'],
+            'Agreeableness': ['Compassion', 'Politeness']}
+psychometric_traits = [trait for factor, facets in big_five.items() for trait in [factor] + facets]
+
+# The psychometric scores are drawn from a multivariate normal distribution and clipped to 0-100. Every trait has its
+# own mean and spread (standard deviation). The correlations of the factors are the meta-analytic ones of the BIG 5 and
+# every facet is correlated with its factor by facet_loading, which also correlates it with the other factors. A full
+# correlation matrix of the traits, in the order of psychometric_traits, can be given instead
+psychometric_means = {trait: 50 for trait in psychometric_traits}
+psychometric_spreads = {trait: 20 for trait in psychometric_traits}
+factor_correlations = {('Concientiousness', 'Neuroticism'): -0.43, ('Concientiousness', 'Extraversion'): 0.29,
+                       ('Concientiousness', 'Openness to Experience'): 0.2, ('Concientiousness', 'Agreeableness'): 0.43,
+                       ('Neuroticism', 'Extraversion'): -0.36, ('Neuroticism', 'Openness to Experience'): -0.17,
+                       ('Neuroticism', 'Agreeableness'): -0.36, ('Extraversion', 'Openness to Experience'): 0.43,
+                       ('Extraversion', 'Agreeableness'): 0.26, ('Openness to Experience', 'Agreeableness'): 0.21}
+facet_loading = 0.8   # The correlation of every facet with its factor
+psychometric_correlation = None   # The correlation matrix of the traits. None builds it from the parameters above
+# ---------------------------------------- PROBLEM PARAMETERS END -----------------------------------------------------#
 
-    employee['Academic Background'] = academic_background[random_background][0]  # Academic Background of the Employee
-    study_period = academic_background[random_background][1]    # Years spent studying
+# The version 4 and variant bits of a UUID, in its high and low 64-bit words, and the positions of its dashes
+uuid_version_mask, uuid_version = np.uint64(0xF000), np.uint64(0x4000)
+uuid_variant_mask, uuid_variant = np.uint64(0xC000000000000000), np.uint64(0x8000000000000000)
+uuid_groups = [8, 4, 4, 4, 12]   # The number of hexadecimal characters of every group of a UUID, between the dashes
+hex_digits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+# This function turns a uniform value of every given year into a day of that year, between the 1st of January and the
+# 31st of December, as a numpy date
+def random_dates(years, uniforms):
+    first_day = (years - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+    last_day = (years - 1969).astype('datetime64[Y]').astype('datetime64[D]') - 1
+    return first_day + (uniforms*(last_day - first_day).astype(int)).astype(int)
+
+
+# The characters of the IDs of the employees with the given indexes, as a matrix with the 36 bytes of a version 4 UUID
+# string in every row. The 128 bits of an ID are 2 words of 64 random bits for the index of the employee, so the ID of
+# an employee only depends on the seed and his/her index. The bits are turned into hexadecimal characters and dashes for
+# all IDs at once
+def id_characters(index, seed=seed):
+    streams = RandomStreams(seed, 'generation')
+    high = (streams.bits(('ID', 'high'), index) & ~uuid_version_mask) | uuid_version
+    low = (streams.bits(('ID', 'low'), index) & ~uuid_variant_mask) | uuid_variant
+    id_bytes = np.column_stack([high, low]).astype('>u8').view(np.uint8).reshape(-1, 16)
+    nibbles = np.stack([id_bytes >> 4, id_bytes & 15], axis=2).reshape(-1, 32)
+    characters = np.full((len(nibbles), 36), ord('-'), dtype=np.uint8)
+    digit, character = 0, 0
+    for group in uuid_groups:
+        characters[:, character:character + group] = hex_digits[nibbles[:, digit:digit + group]]
+        digit, character = digit + group, character + group + 1
+    return characters
+
+
+# The IDs of the employees with the given indexes, as an array of strings
+def employee_ids(index, seed=seed):
+    return id_characters(index, seed).view('S36').ravel().astype(str)
+
+
+# The IDs of the employees with indexes first_index to first_index + number_employees
+def generate_ids(number_employees, first_index=0, seed=seed):
+    return employee_ids(np.arange(first_index, first_index + number_employees), seed)
+
+
+# The first and last names of the employees with the given indexes
+def employee_names(index, seed=seed, locale=locale):
+    streams = RandomStreams(seed, 'generation')
+    return (draw_names(streams.uniform('First Name', index), 'First Name', locale),
+            draw_names(streams.uniform('Last Name', index), 'Last Name', locale))
+
+
+# The position of the department of every employee with the given indexes in departments, and the position of his/her
+# job title among the titles of the department
+def employee_departments(index, seed=seed):
+    streams = RandomStreams(seed, 'generation')
+    title_count = np.array([len(titles) for titles in departments.values()])
+    random_department = streams.uniform('Department', index, 0, len(departments)).astype(int)
+    random_title = (streams.uniform('Job Title', index)*title_count[random_department]).astype(int)
+    return random_department, random_title
+
+
+# This function draws the age, education and hire date of the employees with the given indexes, as a dictionary of
+# arrays. These are all the fields the hire date depends on, so the hire dates of a population, e.g. of its HR
+# employees, can be found without generating the rest of the personal data
+def career_data(index, seed=seed, reference_year=reference_year, new_hires=False):
+    career = {}
+    streams = RandomStreams(seed, 'generation')
+
+    # Generate random age intervals and the exact age of every employee inside his/her interval
+    age_interval = streams.choice('Age Interval', index, employee_age_dist)
+    age_limits = np.array(list(employee_age_range.values()))[age_interval]
+    age = streams.uniform('Age', index, age_limits[:, 0], age_limits[:, 1]).astype(int)
+    career['age_interval'], career['age'] = age_interval, age
+
+    # Randomly decide if employee still works for the company or not. 80% of our records refer to old employees
+    works_here = (streams.uniform('Works Here', index) >= 0.8) | new_hires
+    time_left = np.where(works_here, 0, streams.uniform('Time Left', index, 0, 20).astype(int))
+    career['works_here'], career['time_left'] = works_here, time_left
+    career['age_real'] = age + time_left    # Adjust age for the old employees
+    career['birth_year'] = reference_year - career['age_real']
+
+    # In order to calculate academic background, we need to distinguish the age interval [24,29] from the rest.
+    # Every employee is mapped to a row of the cumulative distribution table below and a single uniform draw per
+    # employee is then turned into a degree by searching that row
+    background_dist = []
+    for interval in employee_age_range.keys():
+        if interval == '2':
+            background_dist.extend(academic_background_dist[interval])
+        else:
+            background_dist.append(academic_background_dist[interval])
+    background_cdf = np.cumsum(background_dist, axis=1)
+    background_cdf = background_cdf / background_cdf[:, -1:]
+    background_row = age_interval + (age_interval > 1) + ((age_interval == 1) & (age >= 27))
+    career['background'] = (streams.uniform('Academic Background', index)[:, np.newaxis] >=
+                            background_cdf[background_row]).sum(axis=1)
+    career['study_period'] = np.array([background[1] for background in
+                                       academic_background.values()])[career['background']]
 
     # The year that the employee was hired will be calculated here
-    if works_here == True:
-        year_hire = int(np.random.uniform((birth_year + 18 + study_period), 2020))
-    else:
-        year_hire = int(np.random.uniform((birth_year + 18 + study_period), 2020 - time_left))
+    graduation_year = career['birth_year'] + 18 + career['study_period']
+    # Young employees may graduate after they left, so the limits are not always in order and the uniform draw is
+    # written out explicitly
+    hire_uniform = streams.uniform('Hire Year', index)
+    year_hire = (graduation_year + (reference_year - time_left - graduation_year)*hire_uniform).astype(int)
+    if new_hires:
+        year_hire = np.full(len(index), reference_year)
+    career['graduation_year'], career['year_hire'] = graduation_year, year_hire
+    career['date_hired'] = random_dates(year_hire, streams.uniform('Date Hired', index))  # The exact date of the hire
+    return career
+
+
+# Through the following function, we create personal and professional data for a whole batch of employees at once.
+# Every field is drawn for all employees as a single numpy array instead of one value per loop. The employees are the
+# ones with indexes first_index to first_index + number_employees and every field is drawn from its own random stream
+# for the index of every employee, so an employee is the same in any batch. The employees are described as they are in
+# the reference year and with new_hires they are all hired in the reference year and still work for the company.
+# Columns with a set of repeated values are built as categoricals straight from the positions of their values, and the
+# IDs from the bytes of their characters, so no string is created for every employee
+def generate_personal_data(number_employees, seed=seed, first_index=0, locale=locale, reference_year=reference_year,
+                           new_hires=False):
+    employee = {}       # Dictionary of columns that store all personal data of the employees
+    streams = RandomStreams(seed, 'generation')
+    index = np.arange(first_index, first_index + number_employees)
+
+    employee['ID'] = id_column(id_characters(index, seed))   # Employee ID
+    employee['First Name'] = draw_name_categories(streams.uniform('First Name', index), 'First Name', locale)
+    employee['Last Name'] = draw_name_categories(streams.uniform('Last Name', index), 'Last Name', locale)
+
+    gender = (streams.uniform('Gender', index) < 0.5).astype(int)
+    employee['Gender'] = pd.Categorical.from_codes(gender, ['F', 'M'])    # Gender
+    marital_status = (streams.uniform('Marital Status', index) >= 0.5).astype(int)
+    employee['Marital Status'] = pd.Categorical.from_codes(marital_status, ['Married', 'Single'])    # Marital Status
+
+    career = career_data(index, seed, reference_year, new_hires)
+    employee['Time Left'] = career['time_left']
+    employee['Works Here'] = career['works_here']     # Define if the employee still works for the company
+    employee['Birthday'] = random_dates(career['birth_year'], streams.uniform('Birthday', index))   # The birthday
+
+    employee['Children'] = np.round(np.maximum(0, streams.normal('Children', index,
+                                                                 1.5*np.minimum(1, career['age_real']/35),
+                                                                 0.5))).astype(int)
+
+    employee['Academic Background'] = pd.Categorical.from_codes(career['background'], [
+        background[0] for background in academic_background.values()])
+    study_period = career['study_period']
+    graduation_year = career['graduation_year']
+    year_hire = career['year_hire']
+    time_left = career['time_left']
+    employee['Date Hired'] = career['date_hired']   # The exact date of the hire
+    employee['Hire Year'] = year_hire   # The year of the hire, kept so the later stages do not extract it from the date
+
+    previous_experience = 0.8*(year_hire - graduation_year)
+    work_exp = previous_experience + (reference_year - time_left - year_hire)
+    employee['Working Experience'] = np.round(np.maximum(0, work_exp)).astype(int)  # The working experience
+    # Number of Previous Employers
+    employee['Number of prev. Employers'] = np.where(np.maximum(0, previous_experience) == 0, 0,
+                                                     (previous_experience/3).astype(int) + 1)
+
+    # The salary of the employee at the date of hire, which is then compounded by at most e for every year worked
+    salary_hired = streams.uniform('Salary Hired', index, basic_income,
+                                   np.maximum(basic_income, basic_income + previous_experience*2000 + study_period*500))
+    years_worked = np.maximum(1, reference_year - time_left - year_hire)
+    employee['Salary'] = streams.uniform('Salary', index, salary_hired, salary_hired*(1+e)**years_worked).astype(int)
+
+    # Random calculation of employee department and of a job title inside that department
+    title_count = np.array([len(titles) for titles in departments.values()])
+    title_offset = np.cumsum(title_count) - title_count
+    job_titles, title_codes = np.unique([title for titles in departments.values() for title in titles],
+                                        return_inverse=True)
+    random_department, random_title = employee_departments(index, seed)
+    employee['Department'] = pd.Categorical.from_codes(random_department, list(departments.keys()))
+    employee['Job Title'] = pd.Categorical.from_codes(title_codes[title_offset[random_department] + random_title],
+                                                      job_titles)
+
+    return schema_frame(employee, 'Professional_Profile')   # pandas data frame to store professional data
+
+
+# ----- Psychometric Data ------ #
+# This function returns the correlation matrix of the psychometric traits. A facet is its factor, weighted by
+# facet_loading, plus noise of its own, so two facets of a factor are correlated by facet_loading**2 and a facet is
+# correlated with the other factors and their facets through its factor. The matrix is always a valid correlation matrix
+def psychometric_correlation_matrix(factor_correlations=factor_correlations, facet_loading=facet_loading):
+    factors = list(big_five.keys())
+    correlation = np.eye(len(factors))
+    for (first_factor, second_factor), value in factor_correlations.items():
+        first, second = factors.index(first_factor), factors.index(second_factor)
+        correlation[first, second] = correlation[second, first] = value
+
+    # The weight of every factor in every trait. The noise of the facets only adds to the diagonal
+    loadings = np.zeros((len(psychometric_traits), len(factors)))
+    for trait, name in enumerate(psychometric_traits):
+        factor = name if name in big_five else next(factor for factor, facets in big_five.items() if name in facets)
+        loadings[trait, factors.index(factor)] = 1 if name in big_five else facet_loading
+    trait_correlation = loadings @ correlation @ loadings.T
+    np.fill_diagonal(trait_correlation, 1)
+    return trait_correlation
+
+
+# The psychometric scores of the employees with the given indexes, as a matrix with a column for every trait of
+# psychometric_traits. Every trait gets a standard normal value from the streams, with the employee index as counter,
+# and a single matrix product with the Cholesky factor of the correlation matrix correlates the values of all traits of
+# the batch. The only constraint here is that each BIG 5 factor lies in-between its 2 facets, so it is clipped to them
+def psychometric_scores(index, seed=seed):
+    streams = RandomStreams(seed, 'generation')
+    correlation = psychometric_correlation
+    if correlation is None:
+        correlation = psychometric_correlation_matrix()
+    normals = streams.normals(psychometric_traits, index) @ np.linalg.cholesky(correlation).T
+    means = np.array([psychometric_means[trait] for trait in psychometric_traits])
+    spreads = np.array([psychometric_spreads[trait] for trait in psychometric_traits])
+    scores = np.clip(np.round(means + spreads*normals), 0, 100).astype(int)
+    for factor, facets in big_five.items():
+        factor, first_facet, second_facet = (psychometric_traits.index(trait) for trait in [factor] + facets)
+        scores[:, factor] = np.clip(scores[:, factor], np.minimum(scores[:, first_facet], scores[:, second_facet]),
+                                    np.maximum(scores[:, first_facet], scores[:, second_facet]))
+    return scores
+
+
+# The psychometrics of the employees with the given IDs, whose indexes start at first_index
+def generate_psychometrics(employee_ids, seed=seed, first_index=0):
+    scores = psychometric_scores(np.arange(first_index, first_index + len(employee_ids)), seed)
+    psychometrics = {'ID': employee_ids}  # Dictionary of columns that store all psychometrics of the employees
+    psychometrics.update(zip(psychometric_traits, scores.T))
+    return schema_frame(psychometrics, 'Psychometric_Indicators')   # data frame of the psychometrics
+
+
+# Through the following function, we create personal, professional and psychometric data for a whole batch of
+# employees at once, in 2 data frames with the compact dtypes of their schemas
+def generate_employees(number_employees, seed=seed, first_index=0, locale=locale, reference_year=reference_year,
+                       new_hires=False):
+    with span('personal data', number_employees):
+        employee_df = generate_personal_data(number_employees, seed, first_index, locale, reference_year, new_hires)
+    with span('psychometrics', number_employees):
+        psychometrics_df = generate_psychometrics(employee_df['ID'].values, seed, first_index)
+    return employee_df, psychometrics_df
 
-    date_hire = radar.random_datetime(start=datetime.date(year=year_hire, month=1, day=1),
-                                      stop=datetime.date(year=year_hire, month=12, day=31)).strftime("%Y-%m-%d")
-    employee['Date Hired'] = date_hire  # The exact date that the employee was hired
 
-    if works_here == True:
-        work_exp = 0.8*(year_hire - (birth_year + 18 + study_period)) + (2020 - year_hire)
+# In this last part, we want to also add the recruiter that hired the employee. The recruiter has to meet 2 conditions:
+# 1) He/She must be working in HR, 2) He/She must be working for the company before the employee
+# The HR employees are sorted once by their hire date into a recruiter index, so the possible recruiters of every
+# employee are the first k recruiters of the index, where k is found by a binary search. The index only keeps the hire
+# day and the index of every HR employee, and the names and IDs of the recruiters are regenerated from their indexes
+def compact_recruiter_index(hire_dates, indexes):
+    hire_days = np.asarray(hire_dates).astype('datetime64[D]')
+    order = np.argsort(hire_days, kind='mergesort')
+    return {'Date Hired': hire_days[order], 'Index': np.asarray(indexes, dtype=np.int64)[order]}
+
+
+# The recruiter index of a data frame of employees whose indexes start at first_index, e.g. the whole population. The
+# names and IDs of the HR employees are taken from the data frame
+def build_recruiter_index(employee_df, first_index=0):
+    hr = (employee_df['Department'] == 'HR').values
+    recruiter_index = compact_recruiter_index(employee_df['Date Hired'].values[hr], first_index + np.flatnonzero(hr))
+    hr_df = employee_df.iloc[recruiter_index['Index'] - first_index]
+    recruiter_index['Recruiter'] = (hr_df['First Name'].astype(str) + ' ' + hr_df['Last Name'].astype(str)).values
+    recruiter_index['Recruiter ID'] = hr_df['ID'].to_numpy(dtype=object)
+    return recruiter_index
+
+
+# A random one of the k possible recruiters is selected for every employee, with the index of the employee as the
+# counter of the random stream. This function returns the position of the recruiter of every employee in the recruiter
+# index, or -1 for employees without a possible recruiter
+def recruiter_positions(hire_dates, recruiter_index, seed=seed, index=None):
+    # Number of HR employees that were hired strictly before each employee
+    possible_recruiters = np.searchsorted(recruiter_index['Date Hired'],
+                                          np.asarray(hire_dates).astype('datetime64[D]'), side='left')
+    random_recruiter = RandomStreams(seed, 'recruiters').uniform('Recruiter', index)
+    recruiter = np.minimum((random_recruiter*possible_recruiters).astype(int), np.maximum(possible_recruiters - 1, 0))
+    return np.where(possible_recruiters > 0, recruiter, -1)
+
+
+# This function returns a categorical column with the recruiter value, e.g. the name, of every employee, given the
+# values of the recruiters and the position of the recruiter of every employee among them. A position of -1 is an
+# employee without a recruiter, whose value is NULL. The column is built from codes, without a string for every employee
+def recruiter_column(values, position):
+    categories, codes = np.unique(np.append(np.asarray(values, dtype=object).astype(str), 'NULL'), return_inverse=True)
+    return pd.Categorical.from_codes(codes[position], categories)   # Position -1 is the code of the appended NULL
+
+
+# This function adds the recruiter of every employee, whose indexes start at first_index. Recruiters of an index
+# without names are regenerated from their indexes, each one once. In case there is no possible recruiter (due to random
+# generation), the recruiter is NULL
+def assign_recruiters(employee_df, recruiter_index, seed=seed, first_index=0, locale=locale):
+    recruiter = recruiter_positions(employee_df['Date Hired'].values, recruiter_index, seed,
+                                    np.arange(first_index, first_index + len(employee_df)))
+    if 'Recruiter' in recruiter_index:
+        names, ids = recruiter_index['Recruiter'], recruiter_index['Recruiter ID']
     else:
-        work_exp = 0.8 * (year_hire - (birth_year + 18 + study_period)) + (2020 - time_left - year_hire)
-
-    employee['Working Experience'] = round(max(0, work_exp)) # The working experience of the employee
-    # Number of Previous Employers
-    if max(0, 0.8*(year_hire - (birth_year + 18 + study_period))) == 0:
-        employee['Number of prev. Employers'] = 0
+        has_recruiter = recruiter >= 0
+        indexes, position = np.unique(recruiter_index['Index'][recruiter[has_recruiter]], return_inverse=True)
+        first_names, last_names = employee_names(indexes, seed, locale)
+        names, ids = first_names + ' ' + last_names, employee_ids(indexes, seed)
+        recruiter = recruiter.copy()
+        recruiter[has_recruiter] = position
+
+    employee_df['Recruiter'] = recruiter_column(names, recruiter)
+    employee_df['Recruiter ID'] = recruiter_column(ids, recruiter)
+    return apply_schema(employee_df, 'Professional_Profile')
+
+
+# Employees are generated in blocks of block_size, which bounds the memory of a generation step. The random values of an
+# employee only depend on the seed and the index of the employee, so the employees are the same for any block size and
+# no matter which shard or process generates them
+def generate_block(block, number_employees, block_size, seed, locale=locale, reference_year=reference_year):
+    first_index = block*block_size
+    return generate_employees(min(block_size, number_employees - first_index), seed, first_index, locale,
+                              reference_year)
+
+
+# A shard is a range of consecutive blocks, generated by one process
+def generate_shard(first_block, last_block, number_employees, block_size, seed, locale, reference_year):
+    blocks = [generate_block(block, number_employees, block_size, seed, locale, reference_year)
+              for block in range(first_block, last_block)]
+    return (pd.concat([block[0] for block in blocks], ignore_index=True),
+            pd.concat([block[1] for block in blocks], ignore_index=True))
+
+
+# This function generates the whole population split in number_shards shards that run on a process pool. The shards
+# are merged in the order of the employees and the recruiters are assigned last, when all HR employees are known
+def generate_population(number_employees, number_shards=1, seed=seed, block_size=block_size, locale=locale,
+                        reference_year=reference_year):
+    number_blocks = -(-number_employees // block_size)
+    shard_limits = np.linspace(0, number_blocks, min(number_shards, number_blocks) + 1).astype(int)
+    shard_arguments = [shard_limits[:-1], shard_limits[1:], [number_employees]*(len(shard_limits) - 1),
+                       [block_size]*(len(shard_limits) - 1), [seed]*(len(shard_limits) - 1),
+                       [locale]*(len(shard_limits) - 1), [reference_year]*(len(shard_limits) - 1)]
+
+    if number_shards > 1:
+        with ProcessPoolExecutor(max_workers=number_shards) as executor:
+            shards = list(executor.map(generate_shard, *shard_arguments))
     else:
-        employee['Number of prev. Employers'] = int(0.8*(year_hire - (birth_year + 18 + study_period))/3) + 1
-
-    # The salary of the employee at the date of hire
-    salary_hired = np.random.uniform(basic_income,
-                                      max(basic_income, basic_income +
-                                        0.8*(year_hire - (birth_year + 18 + study_period)) * 2000 + study_period * 500))
-    if works_here == True:
-        salary = int(np.random.uniform(salary_hired, salary_hired*(1+e)**max(1, (2020 - year_hire))))
+        shards = list(map(generate_shard, *shard_arguments))
+
+    employee_df = pd.concat([shard[0] for shard in shards], ignore_index=True)
+    psychometrics_df = apply_schema(pd.concat([shard[1] for shard in shards], ignore_index=True),
+                                    'Psychometric_Indicators')
+    with span('recruiter assignment', number_employees):
+        # The categories of the names differ from block to block, so they are merged after the blocks
+        employee_df = assign_recruiters(apply_schema(employee_df, 'Professional_Profile'),
+                                        build_recruiter_index(employee_df), seed)
+    return employee_df, psychometrics_df
+
+
+# This function scans a population of number_employees employees block by block for its HR employees and returns its
+# recruiter index. Only the department and the career fields the hire date depends on are drawn, and only the hire
+# dates of the HR employees are kept. A block function, when given, is called with the indexes of the employees of every
+# block and the positions of their departments, so other scans of the population can share the pass
+def scan_recruiter_index(number_employees, seed=seed, block_size=block_size, reference_year=reference_year,
+                         block_function=None):
+    hr_department = list(departments.keys()).index('HR')
+    hire_dates, indexes = [], []
+    for first_index in range(0, number_employees, block_size):
+        index = np.arange(first_index, min(first_index + block_size, number_employees))
+        department_position = employee_departments(index, seed)[0]
+        if block_function is not None:
+            block_function(index, department_position)
+        index = index[department_position == hr_department]
+        hire_dates.append(career_data(index, seed, reference_year)['date_hired'])
+        indexes.append(index)
+    return compact_recruiter_index(np.concatenate(hire_dates), np.concatenate(indexes))
+
+
+# In streaming mode the employees are written to the output data set block by block, so the memory needed is bounded by
+# block_size instead of number_employees. A first pass scans the population for the recruiter index, which only keeps
+# the hire day and index of the HR employees. A second pass generates every block, assigns the recruiters and writes
+# the professional profiles and the psychometric indicators, so the output is the same as the one of
+# generate_population
+def stream_population(number_employees, path, storage_format, seed=seed, block_size=block_size, locale=locale,
+                      reference_year=reference_year):
+    number_blocks = -(-number_employees // block_size)
+    with span('recruiter index', number_employees):
+        recruiter_index = scan_recruiter_index(number_employees, seed, block_size, reference_year)
+
+    profile_writer = TableWriter(path, 'Professional_Profile', storage_format)
+    psychometrics_writer = TableWriter(path, 'Psychometric_Indicators', storage_format)
+    for block in range(number_blocks):
+        employee_df, psychometrics_df = generate_block(block, number_employees, block_size, seed, locale,
+                                                      reference_year)
+        profile_writer.write(assign_recruiters(employee_df, recruiter_index, seed, block*block_size, locale))
+        psychometrics_writer.write(psychometrics_df)
+    profile_writer.close()
+    psychometrics_writer.close()
+
+
+if __name__ == '__main__':
+    if streaming:
+        stream_population(number_employees, output_path, output_format)
     else:
-        salary = int(np.random.uniform(salary_hired, salary_hired * (1 + e)**max(1, (2020 - time_left - year_hire))))
-    employee['Salary'] = salary    # Calculation of the employee salary
-
-    random_department = int(np.random.uniform(0, len(list(departments.keys()))))   # Random index to estimate department
-    employee['Department'] = list(departments.keys())[random_department]   # Random calculation of employee department
-    employee['Job Title'] = departments[employee['Department']][int(np.random.uniform(
-        0, len(departments[employee['Department']])))]
-
-    # ----- Psychometric Data ------ #
-    # The only constraint here is that each BIG 5 factor lies in-between its 2 facets
-
-    # Concientiousness falls between Orderliness and Industriousness
-    psychometrics['Orderliness'] = int(np.random.uniform(0, 100))
-    psychometrics['Industriousness'] = int(np.random.uniform(0, 100))
-    psychometrics['Concientiousness'] = int(np.random.uniform(
-        min(psychometrics['Industriousness'], psychometrics['Orderliness']),
-        max(psychometrics['Industriousness'], psychometrics['Orderliness'])))
-
-    # Neuroticism falls between Withdrawal and Volatility
-    psychometrics['Withdrawal'] = int(np.random.uniform(0, 100))
-    psychometrics['Volatility'] = int(np.random.uniform(0, 100))
-    psychometrics['Neuroticism'] = int(np.random.uniform(
-        min(psychometrics['Withdrawal'], psychometrics['Volatility']),
-        max(psychometrics['Withdrawal'], psychometrics['Volatility'])))
-
-    # Extraversion falls between Enthusiasm and Assertiveness
-    psychometrics['Enthusiasm'] = int(np.random.uniform(0, 100))
-    psychometrics['Assertiveness'] = int(np.random.uniform(0, 100))
-    psychometrics['Extraversion'] = int(np.random.uniform(
-        min(psychometrics['Enthusiasm'], psychometrics['Assertiveness']),
-        max(psychometrics['Enthusiasm'], psychometrics['Assertiveness'])))
-
-    # Openness to Experience falls between Intellect and Openness
-    psychometrics['Intellect'] = int(np.random.uniform(0, 100))
-    psychometrics['Openness'] = int(np.random.uniform(0, 100))
-    psychometrics['Openness to Experience'] = int(np.random.uniform(
-        min(psychometrics['Intellect'], psychometrics['Openness']),
-        max(psychometrics['Intellect'], psychometrics['Openness'])))
-
-    # Agreeableness falls between Compassion and Politeness
-    psychometrics['Compassion'] = int(np.random.uniform(0, 100))
-    psychometrics['Politeness'] = int(np.random.uniform(0, 100))
-    psychometrics['Agreeableness'] = int(np.random.uniform(
-        min(psychometrics['Compassion'], psychometrics['Politeness']),
-        max(psychometrics['Compassion'], psychometrics['Politeness'])))
-
-    all_employees.append(employee.copy())
-    all_psychometrics.append(psychometrics.copy())
-
-# Saving our results in 2 different pandas data frames
-employee_df = pd.DataFrame(all_employees)           # pandas data frame to store professional data
-psychometrics_df = pd.DataFrame(all_psychometrics)  # pandas data frame to store psychometric indicators
+        employee_df, psychometrics_df = generate_population(number_employees, number_shards)
 
-# In this last part, we want to also add the recruiter that hired the employee. The recruiter has to meet 2 conditions:
-# 1) He/She must be working in HR, 2) He/She must be working for the company before the employee
-
-employee_df['Recruiter'] = ''
-employee_df['Recruiter ID'] = ''
-
-for i in range(number_employees):
-    # Identifying all possible recruiters
-    possible_recruiters = employee_df[(
-        (employee_df['Department'] == 'HR')&
-        (pd.to_datetime(employee_df['Date Hired']) < datetime.datetime.strptime(employee_df.at[i, 'Date Hired'], '%Y-%m-%d' ))
-    )].reset_index()[['ID', 'First Name', 'Last Name']]
-
-    # In case there is at least one possible recruiter (due to random generation), we randomly select one of them
-    if len(possible_recruiters) == 0:
-        employee_df.at[i, 'Recruiter'] = 'NULL'
-        employee_df.at[i, 'Recruiter ID'] = 'NULL'
-    else:
-        recruiter = int(np.random.uniform(0, len(possible_recruiters)))
-        employee_df.at[i, 'Recruiter'] = possible_recruiters.at[recruiter, 'First Name'] + ' ' + \
-                                                         possible_recruiters.at[recruiter, 'Last Name']
-        employee_df.at[i, 'Recruiter ID'] = possible_recruiters.at[recruiter, 'ID']
-
-# Write the results to an excel file inside the same folder
-
-with pd.ExcelWriter(output_path) as writer:
-    employee_df.to_excel(writer, sheet_name='Professional_Profile', index=False)
-    psychometrics_df.to_excel(writer, sheet_name='Psychometric_Indicators', index=False)
-writer.save()
-writer.close()
+        # Write the results to the output data set inside the same folder
+        write_tables({'Professional_Profile': employee_df, 'Psychometric_Indicators': psychometrics_df}, output_path,
+                     output_format, mode='w')
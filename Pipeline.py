@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import sys
+
+
+# The parameters of a pipeline run default to the parameters of the 3 scripts. They can be changed by a json config
+# file with the same keys and then by the command line arguments, which have the highest priority. The scripts, and
+# with them pandas and numpy, are only imported here, so the command line help is shown without loading them
+def default_config():
+    import Personal_Profile
+    import Departments
+    import Noise_insertion
+    return {
+        'number_employees': Personal_Profile.number_employees,
+        'seed': Personal_Profile.seed,
+        'noise_seed': Noise_insertion.seed,
+        'number_shards': Personal_Profile.number_shards,
+        'number_workers': Departments.number_workers,
+        'block_size': Personal_Profile.block_size,
+        'reference_year': Personal_Profile.reference_year,
+        'evaluation_model': Departments.evaluation_model,
+        'nan_percentage': Noise_insertion.nan_percentage,
+        'typographic_percentage': Noise_insertion.typographic_percentage,
+        'confusion_percentage': Noise_insertion.confusion_percentage,
+        'drop_percentage': Noise_insertion.drop_percentage,
+        'noise_manifest': Noise_insertion.noise_manifest,
+        'locale': Personal_Profile.locale,
+        'output_folder': sys.path[0],
+        'output_format': 'excel',
+        'checkpoints': False,
+        'report': True,
+        'profile': False
+    }
+
+
+# This function reads the configuration of the run from the command line and the optional config file
+def parse_config(arguments=None):
+    parser = argparse.ArgumentParser(description='Generate the synthetic HR data set and its noisy version in one run. '
+                                                 'The stages pass their tables to each other in memory and only the '
+                                                 'final data sets are written.')
+    parser.add_argument('--config', help='json file with any of the parameters below')
+    parser.add_argument('--number-employees', type=int, help='total number of employees of the company')
+    parser.add_argument('--seed', type=int, help='seed of the employee generation and the department evaluations')
+    parser.add_argument('--noise-seed', type=int, help='seed of the noise insertion')
+    parser.add_argument('--number-shards', type=int, help='number of processes that generate the employees')
+    parser.add_argument('--number-workers', type=int, help='number of processes that evaluate the departments')
+    parser.add_argument('--block-size', type=int, help='number of employees generated with the same random streams')
+    parser.add_argument('--reference-year', type=int, help='current year of the data set')
+    parser.add_argument('--evaluation-model', choices=['random', 'psychometric'],
+                        help='draw the performance of the evaluations at random or score it from the psychometrics')
+    parser.add_argument('--nan-percentage', type=float, help='percentage of missing values')
+    parser.add_argument('--typographic-percentage', type=float, help='percentage of typographic errors')
+    parser.add_argument('--confusion-percentage', type=float, help='percentage of confusion errors')
+    parser.add_argument('--drop-percentage', type=float, help='percentage of forgotten records')
+    parser.add_argument('--no-noise-manifest', dest='noise_manifest', action='store_false', default=None,
+                        help='do not add the manifest of the inserted noise to the noisy data set')
+    parser.add_argument('--locale', help="Faker locale of the employee names, e.g. 'en_US' or 'de_DE'")
+    parser.add_argument('--output-folder', help='folder where the data sets are written')
+    parser.add_argument('--output-format', help="format of the output tables: 'excel', 'parquet', 'feather' or 'csv'")
+    parser.add_argument('--checkpoints', action='store_true', default=None,
+                        help='also write the generated employees before the departments are evaluated')
+    parser.add_argument('--no-report', dest='report', action='store_false', default=None,
+                        help='do not write the run report with the time, rows and memory of every stage')
+    parser.add_argument('--profile', action='store_true', default=None,
+                        help='also profile the run with cProfile and add the slowest functions to the run report')
+    args = parser.parse_args(arguments)
+
+    config = default_config()
+    if args.config is not None:
+        with open(args.config) as config_file:
+            file_config = json.load(config_file)
+        unknown = set(file_config.keys()) - set(config.keys())
+        if unknown:
+            parser.error('unknown parameters in %s: %s' % (args.config, ', '.join(sorted(unknown))))
+        config.update(file_config)
+    config.update({key: value for key, value in vars(args).items() if key != 'config' and value is not None})
+
+    from Storage import storage_formats
+    if config['output_format'] not in storage_formats:
+        parser.error("unknown output format '%s', expected one of: %s" % (config['output_format'],
+                                                                          ', '.join(storage_formats.keys())))
+    return config
+
+
+# This function runs the 3 stages of the pipeline: generation of the employees, evaluation of the departments and noise
+# insertion. The tables are passed from stage to stage in memory. Every stage is timed and at the end of the run a
+# report of the time, rows and memory of every stage and sub-step is written to the output folder
+def run_pipeline(config):
+    import Personal_Profile
+    import Departments
+    import Noise_insertion
+    import Instrumentation
+    from Instrumentation import span
+    from Storage import write_tables
+
+    clean_path = os.path.join(config['output_folder'], 'employees')
+    noisy_path = os.path.join(config['output_folder'], 'noisy_employees')
+    if config['report'] or config['profile']:
+        Instrumentation.start_run(config['profile'])
+
+    with span('generation', config['number_employees']):
+        employee_df, psychometrics_df = Personal_Profile.generate_population(config['number_employees'],
+                                                                             config['number_shards'], config['seed'],
+                                                                             config['block_size'], config['locale'],
+                                                                             config['reference_year'])
+    tables = {'Professional_Profile': employee_df, 'Psychometric_Indicators': psychometrics_df}
+    if config['checkpoints']:
+        with span('write checkpoint'):
+            write_tables(tables, clean_path, config['output_format'], mode='w')
+
+    with span('departments', len(employee_df)):
+        tables.update(Departments.evaluate_all_departments(
+            employee_df, config['number_workers'], config['seed'], config['reference_year'],
+            psychometrics_df=psychometrics_df if config['evaluation_model'] == 'psychometric' else None))
+    with span('write clean data set'):
+        write_tables(tables, clean_path, config['output_format'], mode='w')
+
+    with span('noise'):
+        noisy_tables = Noise_insertion.noisy_data_set(tables, config['noise_seed'], config['nan_percentage'],
+                                                      config['typographic_percentage'], config['confusion_percentage'],
+                                                      config['drop_percentage'], config['locale'],
+                                                      manifest=config['noise_manifest'])
+    with span('write noisy data set'):
+        write_tables(noisy_tables, noisy_path, config['output_format'], mode='w')
+
+    return Instrumentation.finish_run(os.path.join(config['output_folder'], 'run_report.json'), config)
+
+
+if __name__ == '__main__':
+    run_pipeline(parse_config())
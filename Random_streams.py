@@ -0,0 +1,99 @@
+import zlib
+import numpy as np
+import pandas as pd
+
+# Every random value of the data set is a function of the seed, the stage and field it belongs to and a counter that
+# identifies the entity it is drawn for, e.g. the index of an employee or the ID and year of an evaluation. The key of
+# every (seed, stage, field) stream is derived with a numpy SeedSequence and the values are drawn with a counter-based
+# generator: a keyed 64-bit mixing function applied to the counters. A value therefore never depends on how many values
+# were drawn before it, on the order of the loops, on the blocks the employees are generated in or on the process that
+# draws it, and the value of a single entity is drawn in constant time
+
+golden_gamma = np.uint64(0x9E3779B97F4A7C15)   # Odd constant of splitmix64 that spreads the counters over all 64 bits
+mix_multipliers = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+mix_shifts = (np.uint64(30), np.uint64(27), np.uint64(31))
+
+
+# The finalizer of splitmix64, which turns every 64-bit input into a well mixed 64-bit output
+def mix64(values):
+    values = (values ^ (values >> mix_shifts[0]))*mix_multipliers[0]
+    values = (values ^ (values >> mix_shifts[1]))*mix_multipliers[1]
+    return values ^ (values >> mix_shifts[2])
+
+
+# This function turns the IDs of some entities and optionally some numbers of them, e.g. the year of an evaluation,
+# into one 64-bit counter per entity
+def entity_counters(ids, *numbers):
+    counters = pd.util.hash_array(np.asarray(ids, dtype=object))
+    for number in numbers:
+        counters = mix64(counters ^ (np.asarray(number).astype(np.uint64)*golden_gamma))
+    return counters
+
+
+# The random streams of a stage, e.g. RandomStreams(seed, 'departments', 'HR'). Every field of the stage, e.g. 'Bonus',
+# is an independent stream and a value of a field is drawn for every counter
+class RandomStreams:
+    def __init__(self, seed, *path):
+        self.seed = seed
+        self.path = path
+        self.keys = {}
+
+    def substream(self, *names):
+        return RandomStreams(self.seed, *(self.path + names))
+
+    def key(self, field):
+        if field not in self.keys:
+            names = self.path + (field if isinstance(field, tuple) else (field,))
+            spawn_key = tuple(zlib.crc32(str(name).encode('utf-8')) for name in names)
+            self.keys[field] = np.random.SeedSequence(self.seed, spawn_key=spawn_key).generate_state(1, np.uint64)[0]
+        return self.keys[field]
+
+    # 64 random bits for every counter
+    def bits(self, field, counters):
+        return mix64(mix64((np.asarray(counters).astype(np.uint64)*golden_gamma) ^ self.key(field)))
+
+    # Uniform values in [low, high) for every counter. The limits can be arrays with one element per counter
+    def uniform(self, field, counters, low=0.0, high=1.0):
+        uniform = (self.bits(field, counters) >> np.uint64(11))*(1.0/2**53)
+        return low + (np.asarray(high) - low)*uniform
+
+    # Normal values for every counter, drawn with the Box-Muller transform from 2 uniform values
+    def normal(self, field, counters, loc=0.0, scale=1.0):
+        field = field if isinstance(field, tuple) else (field,)
+        radius = np.sqrt(-2*np.log(1 - self.uniform(field + ('radius',), counters)))
+        angle = 2*np.pi*self.uniform(field + ('angle',), counters)
+        return loc + scale*radius*np.cos(angle)
+
+    # Standard normal values for every counter and every given field, as a matrix with one column per field. The fields
+    # are drawn in pairs and the 2 values of a pair come from the same 2 uniform values, through the cosine and the sine
+    # of the Box-Muller transform, so a matrix of normal values needs only as many uniform values as it has columns
+    def normals(self, fields, counters):
+        columns = []
+        for pair in range(0, len(fields), 2):
+            field = tuple(fields[pair:pair + 2])
+            radius = np.sqrt(-2*np.log(1 - self.uniform(field + ('radius',), counters)))
+            angle = 2*np.pi*self.uniform(field + ('angle',), counters)
+            columns.extend([radius*np.cos(angle), radius*np.sin(angle)][:len(field)])
+        return np.column_stack(columns)
+
+    # The index of a random class for every counter, where p are the probabilities of the classes
+    def choice(self, field, counters, p):
+        cdf = np.cumsum(p)
+        return np.minimum(np.searchsorted(cdf/cdf[-1], self.uniform(field, counters), side='right'), len(p) - 1)
+
+
+# Random streams that keep the values they draw for one array of counters, e.g. the counters of the records of a table.
+# The values are then drawn only once for all the noisy replicas of the table that share the seed. Values drawn for any
+# other counters, e.g. a subset of the records, are not kept
+class CachedStreams(RandomStreams):
+    def __init__(self, seed, counters, *path):
+        super().__init__(seed, *path)
+        self.counters = counters
+        self.cache = {}
+
+    def bits(self, field, counters):
+        if counters is not self.counters:
+            return super().bits(field, counters)
+        if field not in self.cache:
+            self.cache[field] = super().bits(field, counters)
+        return self.cache[field]
@@ -0,0 +1,171 @@
+import argparse
+import numpy as np
+import pandas as pd
+import sys
+import os
+import Personal_Profile
+import Departments
+from Storage import read_table, write_tables, storage_formats, TableWriter
+from Schema import apply_schema
+from Instrumentation import span
+from Random_streams import RandomStreams, entity_counters
+
+folder_path = sys.path[0]
+input_path = os.path.join(folder_path, 'employees')   # The data set that is rolled over, which is also updated
+input_format = 'excel'   # Format of the data set tables: 'excel', 'parquet', 'feather' or 'csv'
+
+# All random streams of the script are derived from this seed, which should be the seed the data set was generated with
+seed = 7
+
+reference_year = None   # The current year of the data set before the rollover. None infers it from the data set
+hire_rate = 0.1    # The new hires of a year, as a percentage of the employees that work for the company at its start
+leave_rate = 0.1   # The percentage of the employees that leave the company during a year
+evaluation_model = Departments.evaluation_model   # The evaluation model the data set was generated with
+tables = ['Professional_Profile', 'Psychometric_Indicators'] + list(Departments.department_metrics.keys())
+
+
+# A year rollover moves a data set from its reference year to the next year without generating it again. The
+# employees that left are a year further away, some of the current employees leave, new employees are hired and only
+# the evaluation records of the new year are calculated. The random values of the rollover are drawn from streams of
+# the new year, with the ID of an employee or the index of a new hire as counter
+
+# This function moves the existing employees to the next year. The employees that work for the company at the start of
+# the year gain a year of working experience and a raise of at most e, and leave_rate of them leave during the year
+def advance_employees(employee_df, year, seed=seed):
+    streams = RandomStreams(seed, 'rollover', year)
+    counters = entity_counters(employee_df['ID'])
+    works_here = employee_df['Works Here'].values.astype(bool)
+    leaves = works_here & (streams.uniform('Leaves', counters) < leave_rate)
+    salary_raise = streams.uniform('Salary Raise', counters, 1, 1 + Personal_Profile.e)
+
+    employee_df = employee_df.copy()
+    employee_df['Time Left'] = np.where(works_here, 0, employee_df['Time Left'].values.astype(int) + 1)
+    employee_df['Works Here'] = works_here & ~leaves
+    employee_df['Working Experience'] = employee_df['Working Experience'].values.astype(int) + works_here
+    salary = employee_df['Salary'].values.astype(int)
+    employee_df['Salary'] = np.where(works_here, (salary*salary_raise).astype(int), salary)
+    return apply_schema(employee_df, 'Professional_Profile')
+
+
+# This function hires number_hires new employees in the year. Their indexes follow the ones of the existing employees,
+# so the random streams of the generation give every new hire his/her own values. The recruiter index is built from the
+# existing HR employees and the new HR hires
+def hire_employees(employee_df, number_hires, year, seed=seed, locale=Personal_Profile.locale):
+    first_index = len(employee_df)
+    hires_df, psychometrics_df = Personal_Profile.generate_employees(number_hires, seed, first_index, locale, year,
+                                                                     new_hires=True)
+    columns = ['ID', 'First Name', 'Last Name', 'Date Hired', 'Department']
+    recruiter_index = Personal_Profile.build_recruiter_index(pd.concat([employee_df[columns], hires_df[columns]],
+                                                                       ignore_index=True))
+    return Personal_Profile.assign_recruiters(hires_df, recruiter_index, seed, first_index), psychometrics_df
+
+
+# The data set does not store its reference year, so it is the last year of its evaluation records, which the current
+# employees always have. A data set without evaluations falls back to the last year an employee was hired
+def data_set_year(tables):
+    years = [df['Year'].max() for table, df in tables.items() if table in Departments.department_metrics and len(df)]
+    if not years:
+        years = [tables['Professional_Profile']['Hire Year'].max()]
+    return int(max(years))
+
+
+# This function rolls a data set, given as a dictionary of data frames, over from its reference year to the next year.
+# It returns the tables of the data set in the new year and the rows that were added to them: the profiles and
+# psychometrics of the new hires and the evaluation records of the new year. The evaluation records of the earlier
+# years are kept as they are. Without a reference year it is inferred from the data set, and a data set that already
+# has records of the new year is not rolled over again
+def roll_over(tables, reference_year=reference_year, number_hires=None, seed=seed, locale=Personal_Profile.locale,
+              number_workers=Departments.number_workers, evaluation_model=evaluation_model):
+    if reference_year is None:
+        reference_year = data_set_year(tables)
+    year = reference_year + 1
+    for table, df in tables.items():
+        if table in Departments.department_metrics and (df['Year'].values >= year).any():
+            raise ValueError("The data set already has '%s' records of %d, so it was already rolled over to %d. Roll "
+                             "it over from %d instead" % (table, year, year, data_set_year(tables)))
+    employee_df = tables['Professional_Profile']
+    if number_hires is None:
+        number_hires = int(round(hire_rate*employee_df['Works Here'].values.astype(bool).sum()))
+
+    with span('leavers', len(employee_df)):
+        employee_df = advance_employees(employee_df, year, seed)
+    with span('new hires', number_hires):
+        hires_df, psychometrics_df = hire_employees(employee_df, number_hires, year, seed, locale)
+    employee_df = apply_schema(pd.concat([employee_df, hires_df], ignore_index=True), 'Professional_Profile')
+    all_psychometrics_df = None
+    if evaluation_model == 'psychometric':
+        all_psychometrics_df = pd.concat([tables['Psychometric_Indicators'], psychometrics_df], ignore_index=True)
+    with span('evaluations', len(employee_df)):
+        evaluations = Departments.evaluate_all_departments(employee_df, number_workers, seed, year, first_year=year,
+                                                           psychometrics_df=all_psychometrics_df)
+
+    new_rows = {'Professional_Profile': hires_df, 'Psychometric_Indicators': psychometrics_df}
+    new_rows.update(evaluations)
+    next_tables = {'Professional_Profile': employee_df}
+    for table, df in new_rows.items():
+        if table != 'Professional_Profile':
+            next_tables[table] = apply_schema(pd.concat([tables[table], df], ignore_index=True), table)
+    return next_tables, new_rows
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description='Roll a data set over to the next years: mark the employees that '
+                                                 'leave, add the new hires and add the evaluations of the new years '
+                                                 'without generating the data set again.')
+    parser.add_argument('--path', default=input_path, help='data set that is rolled over (default: %(default)s)')
+    parser.add_argument('--format', default=input_format, choices=list(storage_formats.keys()),
+                        help='format of the data set tables (default: %(default)s)')
+    parser.add_argument('--output-path', default=None, help='data set where the result is written (default: --path)')
+    parser.add_argument('--reference-year', type=int, default=reference_year,
+                        help='current year of the data set before the rollover (default: the last year of its '
+                             'evaluations)')
+    parser.add_argument('--years', type=int, default=1, help='number of years to roll over (default: %(default)s)')
+    parser.add_argument('--new-hires', type=int, default=None,
+                        help='new hires of every year (default: %s of the current employees)' % hire_rate)
+    parser.add_argument('--seed', type=int, default=seed, help='seed the data set was generated with')
+    parser.add_argument('--evaluation-model', default=evaluation_model, choices=['random', 'psychometric'],
+                        help='evaluation model the data set was generated with (default: %(default)s)')
+    parser.add_argument('--locale', default=Personal_Profile.locale, help='Faker locale of the employee names')
+    parser.add_argument('--number-workers', type=int, default=Departments.number_workers,
+                        help='number of processes that evaluate the departments')
+    args = parser.parse_args(arguments)
+    if args.output_path is None:
+        args.output_path = args.path
+    return args
+
+
+# This function writes the rollover of a data set to it. The existing profiles change, so the Professional_Profile table
+# is written again, while only the added rows of the other tables are appended to them. An excel workbook cannot be
+# appended to, so it is written again as a whole
+def write_rollover(data_set, added_rows, path, storage_format):
+    if storage_format == 'excel':
+        write_tables(data_set, path, storage_format, mode='w')
+        return
+    write_tables({'Professional_Profile': data_set['Professional_Profile']}, path, storage_format, mode='w')
+    for table, dfs in added_rows.items():
+        if table != 'Professional_Profile':
+            writer = TableWriter(path, table, storage_format, mode='a')
+            writer.write(apply_schema(pd.concat(dfs, ignore_index=True), table))
+            writer.close()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    data_set = {table: read_table(args.path, table, args.format) for table in tables}
+    if args.reference_year is None:
+        args.reference_year = data_set_year(data_set)
+    added_rows = {table: [] for table in tables}   # The rows added to every table over all years
+    for year in range(args.reference_year, args.reference_year + args.years):
+        data_set, new_rows = roll_over(data_set, year, args.new_hires, args.seed, args.locale, args.number_workers,
+                                       args.evaluation_model)
+        for table, df in new_rows.items():
+            added_rows[table].append(df)
+        employee_df = data_set['Professional_Profile']
+        leavers = (employee_df['Time Left'].values == 0) & ~employee_df['Works Here'].values.astype(bool)
+        print('%d: %d new hires, %d leavers, %d new evaluation records' % (
+            year + 1, len(new_rows['Professional_Profile']), leavers.sum(),
+            sum(len(new_rows[department]) for department in Departments.department_metrics.keys())))
+    if args.output_path == args.path:
+        write_rollover(data_set, added_rows, args.path, args.format)
+    else:   # A new data set gets all tables
+        write_tables(data_set, args.output_path, args.format, mode='w')
@@ -0,0 +1,140 @@
+import importlib.util
+import numpy as np
+import pandas as pd
+
+# IDs are stored as arrow strings, which keep the 36 characters of all IDs in a single buffer instead of one python
+# object per ID. Without pyarrow they stay python strings
+id_dtype = 'string[pyarrow]' if importlib.util.find_spec('pyarrow') is not None else object
+
+# The largest number of bytes of a chunk of arrow strings, whose offsets are 32-bit integers
+arrow_chunk_bytes = 2**31 - 1
+
+
+# This function turns the characters of IDs of the same length, a matrix of bytes with a row for every ID, into an ID
+# column. The rows of the matrix already are the data buffer of arrow strings, so the arrow strings are built straight
+# from it with offsets every length bytes, without a python string for every ID
+def id_column(characters):
+    characters = np.ascontiguousarray(characters, dtype=np.uint8)
+    number_ids, length = characters.shape
+    if id_dtype == object:
+        return characters.view('S%d' % length).ravel().astype(str).astype(object)
+    import pyarrow as pa
+    chunk_size = max(1, arrow_chunk_bytes // max(1, length))
+    chunks = []
+    for start in range(0, number_ids, chunk_size):
+        chunk = characters[start:start + chunk_size]
+        offsets = np.arange(0, (len(chunk) + 1)*length, length, dtype=np.int32)
+        chunks.append(pa.Array.from_buffers(pa.string(), len(chunk), [None, pa.py_buffer(offsets),
+                                                                      pa.py_buffer(chunk)]))
+    return pd.arrays.ArrowStringArray(pa.chunked_array(chunks, type=pa.string()))
+
+
+# Columns with a small set of repeated values are stored as categoricals. A list declares the categories of the column,
+# so they are the same in every block and every table, while 'category' takes the categories from the values
+departments = ['Sales', 'Product', 'Finance', 'HR', 'Legal', 'Strategy', 'Technology']
+performances = ['Low', 'Medium', 'High']
+department_percentiles = ['Bottom 15%', 'Mid 70%', 'Top 15%']
+
+# The nullable variants of the numeric columns, used once missing values are inserted into a column
+nullable_dtypes = {'uint8': 'UInt8', 'uint16': 'UInt16', 'int16': 'Int16', 'int32': 'Int32', 'int64': 'Int64',
+                   'bool': 'boolean'}
+
+# The declared dtypes of the columns of every table. The integer widths leave room for a typographic error, which
+# changes one digit of a number but never adds one
+profile_schema = {
+    'ID': id_dtype, 'First Name': 'category', 'Last Name': 'category', 'Gender': ['F', 'M'],
+    'Marital Status': ['Married', 'Single'], 'Time Left': 'uint8', 'Works Here': 'bool',
+    'Birthday': 'datetime64[ns]', 'Children': 'uint8', 'Academic Background': ['High School', 'Bachelor', 'MSc', 'PhD'],
+    'Date Hired': 'datetime64[ns]', 'Hire Year': 'int16', 'Working Experience': 'uint8',
+    'Number of prev. Employers': 'uint8', 'Salary': 'int32', 'Department': departments, 'Job Title': 'category',
+    'Recruiter': 'category', 'Recruiter ID': 'category'
+}
+
+psychometrics_schema = {'ID': id_dtype}
+for column in ['Concientiousness', 'Orderliness', 'Industriousness', 'Neuroticism', 'Withdrawal', 'Volatility',
+               'Extraversion', 'Enthusiasm', 'Assertiveness', 'Openness to Experience', 'Intellect', 'Openness',
+               'Agreeableness', 'Compassion', 'Politeness']:
+    psychometrics_schema[column] = 'uint8'   # All psychometric scores lie between 0 and 100
+
+evaluation_schema = {
+    'ID': id_dtype, 'Year': 'int16', 'Loyalty': 'uint8', 'Number of Promotions': 'uint8', 'Bonus': 'int32',
+    'Overtime': 'uint16', 'Chargeability': 'uint8', 'Department Percentile': department_percentiles,
+    'Performance': performances
+}
+
+# The noise manifest lists every cell that the noise changed and every record it dropped. The values of the changed
+# cells come from columns of any dtype, so they are stored as text like the names of the columns
+noise_types = ['Typographic Error', 'Missing Value', 'Name Confusion', 'Marital Status Confusion',
+               'Department Confusion', 'Dropped Record']
+manifest_schema = {
+    'Table': 'category', 'Row': 'int64', 'ID': id_dtype, 'Year': 'Int16', 'Column': id_dtype, 'Noise': noise_types,
+    'Original': id_dtype, 'Noisy': id_dtype
+}
+
+table_schemas = {
+    'Professional_Profile': profile_schema,
+    'Psychometric_Indicators': psychometrics_schema,
+    'HR': dict(evaluation_schema, **{'Total Time of hired employees(years)': 'int32',
+                                     'Average Recruitment Time(months)': 'float64', 'Employees Fired': 'int32'}),
+    'Sales': dict(evaluation_schema, **{'Total Sales': 'int32', 'Clients Asking': 'uint8'}),
+    'Product': dict(evaluation_schema, **{'Total Defects': 'uint8', 'Number of Complaining Customers': 'uint8'}),
+    'Finance': dict(evaluation_schema, **{'Non - Servicing Obligactions': 'int16'}),
+    'Legal': dict(evaluation_schema, **{'Successful Lawsuits': 'uint8', 'Disputes amicably resolved': 'uint8'}),
+    'Strategy': dict(evaluation_schema, **{'Total Sales': 'int32', 'Number of Teams': 'uint8',
+                                           'Number of Projects': 'uint8'}),
+    'Technology': dict(evaluation_schema, **{'Problematic Code Commits': 'uint8'}),
+    'Noise_Manifest': manifest_schema
+}
+
+
+# This function returns the dtype of a column. Values outside the declared categories of a column, e.g. typographic
+# errors, are added as extra categories instead of being lost, and numeric columns with missing values get the
+# nullable variant of their dtype
+def column_dtype(values, dtype):
+    if isinstance(dtype, list):
+        if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == dtype:
+            return values.dtype
+        extra = sorted(set(values.dropna().unique()) - set(dtype))
+        return pd.CategoricalDtype(dtype + extra)
+    if dtype in nullable_dtypes and values.hasnans:
+        return nullable_dtypes[dtype]
+    return dtype
+
+
+# The columns that older data sets lack and that are derived from another column of the table when it is read, as
+# (source column, function of the source values)
+derived_columns = {
+    'Professional_Profile': {'Hire Year': ('Date Hired', lambda dates: pd.to_datetime(dates).dt.year)}
+}
+
+
+# This function enforces the declared schema of a table on a data frame. Columns that are not declared are kept as
+# they are and derived columns that are missing are added right after their source column. A data frame that already
+# has the schema is returned as it is
+def apply_schema(df, table):
+    for column, (source, derive) in derived_columns.get(table, {}).items():
+        if column not in df.columns and source in df.columns:
+            df = df.copy()
+            df.insert(df.columns.get_loc(source) + 1, column, derive(df[source]))
+    schema = table_schemas.get(table, {})
+    dtypes = {column: column_dtype(df[column], dtype) for column, dtype in schema.items() if column in df.columns}
+    casts = {column: dtype for column, dtype in dtypes.items() if df[column].dtype != dtype}
+    return df.astype(casts) if casts else df
+
+
+# This function builds the data frame of a table from a dictionary of columns. Numpy columns of a numeric or date dtype
+# are cast to their declared dtype as arrays, which is much cheaper than casting the columns of a data frame one by one,
+# and the schema is then enforced on the rest of the columns
+def schema_frame(columns, table):
+    schema = table_schemas.get(table, {})
+    numpy_dtypes = list(nullable_dtypes.keys()) + ['datetime64[ns]']
+    columns = {column: values.astype(schema[column]) if isinstance(values, np.ndarray) and
+               schema.get(column) in numpy_dtypes else values for column, values in columns.items()}
+    return apply_schema(pd.DataFrame(columns), table)
+
+
+# This function turns the categorical columns of a data frame back into plain values, so new values can be written
+# into them
+def plain_columns(df, columns):
+    return df.astype({column: object for column in columns
+                      if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype)})
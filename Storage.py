@@ -0,0 +1,176 @@
+import os
+import pandas as pd
+from Schema import apply_schema
+from Instrumentation import span
+
+# The formats in which the tables of a data set can be stored. Excel keeps all tables as sheets of a single workbook,
+# while every other format stores each table as a separate file inside the folder of the data set
+storage_formats = {'excel': '.xlsx', 'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+
+excel_max_rows = 1048576   # Maximum number of rows of an excel sheet, the header included
+csv_chunk_size = 100000    # Number of rows that are written to a csv file or excel sheet at a time
+# Only empty csv and excel cells are missing values. Strings like 'NULL', the recruiter of employees without one, stay
+# strings
+csv_na_values = ['']
+
+
+# This function returns the file that stores a table of a data set. The path of a data set has no extension
+def table_path(path, table, storage_format):
+    if storage_format not in storage_formats:
+        raise ValueError("Unknown storage format '%s', expected one of: %s" %
+                         (storage_format, ', '.join(storage_formats.keys())))
+    if storage_format == 'excel':
+        return path + storage_formats['excel']
+    return os.path.join(path, table + storage_formats[storage_format])
+
+
+# This function writes a new excel workbook with one sheet per table. The workbook is written in write-only mode, which
+# streams the rows of every sheet to the file instead of keeping all cells of the workbook in memory. Dates are written
+# as excel dates without a time
+def write_workbook(tables, file_path):
+    import openpyxl   # openpyxl is only loaded when excel files are written
+    workbook = openpyxl.Workbook(write_only=True)
+    for table, df in tables.items():
+        with span(table, len(df)):
+            sheet = workbook.create_sheet(title=table)
+            sheet.append([str(column) for column in df.columns])
+            for start in range(0, len(df), csv_chunk_size):
+                chunk = df.iloc[start:start + csv_chunk_size].copy()
+                for column in chunk.columns[[pd.api.types.is_datetime64_any_dtype(dtype) for dtype in chunk.dtypes]]:
+                    chunk[column] = chunk[column].dt.date
+                chunk = chunk.astype(object).where(chunk.notna(), None)   # Missing values are written as empty cells
+                for row in chunk.itertuples(index=False, name=None):
+                    sheet.append(row)
+    with span('save workbook'):
+        workbook.save(file_path)
+
+
+# This function writes a number of tables to a data set. The tables are given as a dictionary of data frames with the
+# table names as keys. With mode 'w' a new data set is started, while with mode 'a' the tables are added to it
+def write_tables(tables, path, storage_format, mode='a'):
+    if storage_format == 'excel':
+        for table, df in tables.items():
+            if len(df) >= excel_max_rows:
+                raise ValueError("Table '%s' has %d rows, more than an excel sheet can hold. Use one of the other "
+                                 "storage formats instead" % (table, len(df)))
+        file_path = table_path(path, None, storage_format)
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        if mode == 'a' and os.path.exists(file_path):
+            # The existing workbook is loaded and saved only once, no matter how many sheets are added to it. Sheets
+            # that already exist are replaced, e.g. when the departments are evaluated again
+            with pd.ExcelWriter(file_path, engine='openpyxl', mode='a', if_sheet_exists='replace',
+                                date_format='YYYY-MM-DD', datetime_format='YYYY-MM-DD') as writer:
+                for table, df in tables.items():
+                    with span(table, len(df)):
+                        df.to_excel(writer, index=False, sheet_name=table)
+        else:
+            write_workbook(tables, file_path)
+        return
+
+    os.makedirs(path, exist_ok=True)
+    for table, df in tables.items():
+        file_path = table_path(path, table, storage_format)
+        with span(table, len(df)):
+            if storage_format == 'parquet':
+                df.to_parquet(file_path, index=False)
+            elif storage_format == 'feather':
+                df.reset_index(drop=True).to_feather(file_path)
+            else:
+                df.to_csv(file_path, index=False, chunksize=csv_chunk_size)
+
+
+# This function writes a single table to a data set
+def write_table(df, path, table, storage_format, mode='a'):
+    write_tables({table: df}, path, storage_format, mode)
+
+
+# This function reads a table of a data set and enforces its schema, which also turns the dates of csv files back into
+# dates
+def read_table(path, table, storage_format):
+    file_path = table_path(path, table, storage_format)
+    if storage_format == 'excel':
+        df = pd.read_excel(file_path, sheet_name=table, engine='openpyxl', keep_default_na=False,
+                           na_values=csv_na_values)
+    elif storage_format == 'parquet':
+        df = pd.read_parquet(file_path)
+    elif storage_format == 'feather':
+        df = pd.read_feather(file_path)
+    else:
+        df = pd.read_csv(file_path, keep_default_na=False, na_values=csv_na_values)
+    return apply_schema(df, table)
+
+
+# This function reads a table of a data set chunk by chunk, so a table larger than the memory can be processed as it is
+# read. Every chunk has at most chunk_size rows and the schema of the table. Csv files are parsed chunk by chunk,
+# parquet files are read batch by batch and feather files are memory mapped, so only the batches of a chunk are loaded
+def read_chunks(path, table, storage_format, chunk_size=csv_chunk_size):
+    if storage_format == 'excel':
+        raise ValueError("Tables cannot be read chunk by chunk from excel. Use one of the other storage formats")
+    file_path = table_path(path, table, storage_format)
+    if storage_format == 'csv':
+        for df in pd.read_csv(file_path, chunksize=chunk_size, keep_default_na=False, na_values=csv_na_values):
+            yield apply_schema(df, table)
+        return
+
+    import pyarrow as pa
+    if storage_format == 'parquet':
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(file_path))
+        batches = (reader.get_batch(batch).slice(start, chunk_size) for batch in range(reader.num_record_batches)
+                   for start in range(0, reader.get_batch(batch).num_rows, chunk_size))
+    for batch in batches:
+        yield apply_schema(pa.Table.from_batches([batch]).to_pandas(), table)
+
+
+# This class writes a table to a data set chunk by chunk, so a table larger than the memory can be written as it is
+# generated. Parquet chunks are stored as row groups and feather chunks as record batches of a single file. The
+# categories of a column can differ from chunk to chunk, so categorical columns are written as plain values. With mode
+# 'a' the chunks are appended to an existing table: csv rows are added to the end of the file, while parquet and feather
+# files cannot be changed in place, so their batches are copied to a new file that replaces the table when it is closed
+class TableWriter:
+    def __init__(self, path, table, storage_format, mode='w'):
+        if storage_format == 'excel':
+            raise ValueError("Tables cannot be written chunk by chunk to excel. Use one of the other storage formats")
+        os.makedirs(path, exist_ok=True)
+        self.table_path = table_path(path, table, storage_format)
+        self.file_path = self.table_path
+        self.storage_format = storage_format
+        self.writer = None
+        self.schema = None
+        self.append = mode == 'a' and os.path.exists(self.table_path)
+        if self.append and storage_format != 'csv':
+            self.file_path = self.table_path + '.tmp'
+            for df in read_chunks(path, table, storage_format):
+                self.write_chunk(df)
+
+    def write(self, df):
+        with span('write ' + os.path.basename(self.table_path), len(df)):
+            self.write_chunk(df)
+
+    def write_chunk(self, df):
+        df = df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+        if self.storage_format == 'csv':
+            if self.writer is None:
+                self.writer = open(self.file_path, 'a' if self.append else 'w', newline='')
+                df.to_csv(self.writer, index=False, header=not self.append)
+            else:
+                df.to_csv(self.writer, index=False, header=False)
+            return
+
+        import pyarrow as pa
+        if self.writer is None:
+            self.schema = pa.Schema.from_pandas(df, preserve_index=False)
+            if self.storage_format == 'parquet':
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.file_path, self.schema)
+            else:
+                self.writer = pa.ipc.new_file(self.file_path, self.schema)
+        self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            if self.file_path != self.table_path:
+                os.replace(self.file_path, self.table_path)
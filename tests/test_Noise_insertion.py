@@ -0,0 +1,44 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Personal_Profile
+import Departments
+import Noise_insertion
+from Schema import apply_schema
+
+
+# The tables of a small data set, with the compact dtypes of their schemas
+def schema_tables(number_employees=2000, seed=7):
+    employee_df, psychometrics_df = Personal_Profile.generate_population(number_employees, 1, seed)
+    tables = {'Professional_Profile': employee_df, 'Psychometric_Indicators': psychometrics_df}
+    tables.update(Departments.evaluate_all_departments(employee_df, 1, seed))
+    return {table: apply_schema(df, table) for table, df in tables.items()}
+
+
+# Typographic errors are written into the narrow integer columns of the schema without changing their dtypes
+def test_noise_insertion_after_apply_schema():
+    tables = schema_tables()
+    noisy_tables = Noise_insertion.noisy_data_set(tables, nan_percentage=0, confusion_percentage=0,
+                                                  drop_percentage=0, manifest=True)
+    manifest_df = noisy_tables['Noise_Manifest']
+    for table, spec in Noise_insertion.noise_specs.items():
+        for column in spec['Digits']:
+            assert noisy_tables[table][column].dtype == tables[table][column].dtype
+    typographic = manifest_df[manifest_df['Noise'] == 'Typographic Error']
+    assert len(typographic) > 0
+    changed = typographic[typographic['Table'] == 'Professional_Profile']
+    noisy_df = noisy_tables['Professional_Profile']
+    for row, column, noisy in zip(changed['Row'], changed['Column'], changed['Noisy']):
+        assert str(noisy_df[column].iloc[row]) == noisy
+
+
+# The noise of a table is the same with and without the manifest
+def test_noise_insertion_manifest_does_not_change_noise():
+    tables = schema_tables(500)
+    noisy_tables = Noise_insertion.noisy_data_set(tables)
+    manifest_tables = Noise_insertion.noisy_data_set(tables, manifest=True)
+    for table in noisy_tables:
+        pd.testing.assert_frame_equal(noisy_tables[table], manifest_tables[table])
@@ -0,0 +1,53 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Personal_Profile
+import Departments
+import Noise_insertion
+from Storage import storage_formats, write_tables, read_table
+
+
+# The clean tables of a small data set and their noisy versions, which hold missing values
+def data_set_tables(number_employees=1000, seed=7):
+    employee_df, psychometrics_df = Personal_Profile.generate_population(number_employees, 1, seed)
+    tables = {'Professional_Profile': employee_df, 'Psychometric_Indicators': psychometrics_df}
+    tables.update(Departments.evaluate_all_departments(employee_df, 1, seed))
+    return tables, Noise_insertion.noisy_data_set(tables, seed)
+
+
+# The values of a table as text, with None for missing values, so tables read from any format are compared as they are
+# shown
+def table_values(df):
+    values = df.astype(object).where(df.notna(), None)
+    for column in df.columns[[pd.api.types.is_datetime64_any_dtype(dtype) for dtype in df.dtypes]]:
+        values[column] = df[column].dt.date.astype(object).where(df[column].notna(), None)
+    return values.reset_index(drop=True)
+
+
+# Every table is read back as it was written, including the 'NULL' recruiters and the missing values of the noise
+@pytest.mark.parametrize('storage_format', list(storage_formats.keys()))
+def test_round_trip(tmp_path, storage_format):
+    tables, noisy_tables = data_set_tables()
+    for name, data_set in [('employees', tables), ('noisy_employees', noisy_tables)]:
+        path = str(tmp_path / name)
+        write_tables(data_set, path, storage_format, mode='w')
+        for table, df in data_set.items():
+            read_df = read_table(path, table, storage_format)
+            pd.testing.assert_frame_equal(table_values(read_df), table_values(df), check_dtype=False)
+    assert (tables['Professional_Profile']['Recruiter'].astype(str) == 'NULL').any()
+
+
+# Sheets that already exist in a workbook are replaced when the tables are written to it again
+def test_excel_sheets_are_replaced(tmp_path):
+    tables, noisy_tables = data_set_tables(300)
+    path = str(tmp_path / 'employees')
+    write_tables({'Professional_Profile': tables['Professional_Profile']}, path, 'excel', mode='w')
+    evaluations = {table: tables[table] for table in Departments.department_metrics}
+    write_tables(evaluations, path, 'excel')
+    write_tables(evaluations, path, 'excel')
+    for table, df in evaluations.items():
+        assert len(read_table(path, table, 'excel')) == len(df)